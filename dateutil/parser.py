@@ -13,6 +13,7 @@ import string
 import time
 import sys
 import os
+import re
 
 try:
     from cStringIO import StringIO
@@ -140,9 +141,59 @@ class _timelex(object):
         return token
 
     def split(cls, s):
+        if isinstance(s, basestring):
+            return cls._split_string(s)
         return list(cls(s))
     split = classmethod(split)
 
+    def _split_string(cls, s):
+        if isinstance(s, unicode):
+            # Same as reading it through StringIO.
+            s = s.encode("ascii")
+        if "\x00" in s:
+            s = s.replace("\x00", "")
+        tokens = []
+        end = len(s)
+        for match in cls._split_re.finditer(s):
+            token = match.group()
+            if match.group(1):
+                tokens.append(" ")
+            elif "." not in token or token == ".":
+                tokens.append(token)
+            else:
+                # get_token() only notices letters in a token that starts
+                # with a digit once it reads another character after the
+                # first letter.
+                if token[0] in "0123456789":
+                    seenletters = False
+                    for i in xrange(len(token)):
+                        if token[i] not in "0123456789.":
+                            seenletters = (i < len(token)-1 or
+                                           match.end() < end)
+                            break
+                else:
+                    seenletters = True
+                if (seenletters or token.count(".") > 1 or
+                    token[-1] == "."):
+                    l = token.split(".")
+                    tokens.append(l[0])
+                    for tok in l[1:]:
+                        tokens.append(".")
+                        if tok:
+                            tokens.append(tok)
+                else:
+                    tokens.append(token)
+        return tokens
+    _split_string = classmethod(_split_string)
+
+# Matches the same tokens as get_token() in one pass: a run of letters or
+# digits, optionally followed by dots and further runs (a letter run and a
+# digit run may only meet across a dot), a single whitespace character, or
+# any other single character.
+_timelex._split_re = re.compile(r"(?:[%(w)s]+|[0-9]+)(?:\.+(?:[%(w)s]+|[0-9]+))*\.*"
+                                r"|([ \t\r\n])|." %
+                                {"w": re.escape(_timelex("").wordchars)}, re.S)
+
 
 class _resultbase(object):
 
@@ -47,6 +47,36 @@ M365MASK = tuple(M365MASK)
 easter = None
 parser = None
 
+# The masks built by _iterinfo only depend on the shape of the year (and
+# the month) and a few of the rule's parameters, so they are shared between
+# rules through a bounded LRU cache.  They must never be modified once
+# built.
+MASKCACHESIZE = 256
+_maskcache = {}
+_maskcachetick = 0
+_maskcachelock = thread.allocate_lock()
+
+def _cachedmasks(key, build, *args):
+    global _maskcachetick
+    _maskcachelock.acquire()
+    try:
+        _maskcachetick += 1
+        entry = _maskcache.get(key)
+        if entry is not None:
+            masks = entry[0]
+        else:
+            masks = build(*args)
+            if len(_maskcache) >= MASKCACHESIZE:
+                # Drop the least recently used half.
+                entries = sorted(_maskcache.items(),
+                                 key=lambda item: item[1][1])
+                for oldkey, _ in entries[:len(entries)//2]:
+                    del _maskcache[oldkey]
+        _maskcache[key] = (masks, _maskcachetick)
+        return masks
+    finally:
+        _maskcachelock.release()
+
 class weekday(object):
     __slots__ = ["weekday", "n"]
 
@@ -647,126 +677,161 @@ class _iterinfo(object):
             self.yearordinal = firstyday.toordinal()
             self.yearweekday = firstyday.weekday()
 
-            wday = datetime.date(year, 1, 1).weekday()
-            if self.yearlen == 365:
-                self.mmask = M365MASK
-                self.mdaymask = MDAY365MASK
-                self.nmdaymask = NMDAY365MASK
-                self.wdaymask = WDAYMASK[wday:]
-                self.mrange = M365RANGE
+            # The masks only depend on the length of the year and the
+            # weekday it starts on, and week numbers also on the length of
+            # the year before.
+            if rr._byweekno:
+                key = ("year", self.yearlen, self.yearweekday,
+                       calendar.isleap(year-1), rr._byweekno, rr._wkst)
             else:
-                self.mmask = M366MASK
-                self.mdaymask = MDAY366MASK
-                self.nmdaymask = NMDAY366MASK
-                self.wdaymask = WDAYMASK[wday:]
-                self.mrange = M366RANGE
-
-            if not rr._byweekno:
-                self.wnomask = None
-            else:
-                self.wnomask = [0]*(self.yearlen+7)
-                #no1wkst = firstwkst = self.wdaymask.index(rr._wkst)
-                no1wkst = firstwkst = (7-self.yearweekday+rr._wkst)%7
-                if no1wkst >= 4:
-                    no1wkst = 0
-                    # Number of days in the year, plus the days we got
-                    # from last year.
-                    wyearlen = self.yearlen+(self.yearweekday-rr._wkst)%7
-                else:
-                    # Number of days in the year, minus the days we
-                    # left in last year.
-                    wyearlen = self.yearlen-no1wkst
-                div, mod = divmod(wyearlen, 7)
-                numweeks = div+mod//4
-                for n in rr._byweekno:
-                    if n < 0:
-                        n += numweeks+1
-                    if not (0 < n <= numweeks):
-                        continue
-                    if n > 1:
-                        i = no1wkst+(n-1)*7
-                        if no1wkst != firstwkst:
-                            i -= 7-firstwkst
-                    else:
-                        i = no1wkst
-                    for j in range(7):
-                        self.wnomask[i] = 1
-                        i += 1
-                        if self.wdaymask[i] == rr._wkst:
-                            break
-                if 1 in rr._byweekno:
-                    # Check week number 1 of next year as well
-                    # TODO: Check -numweeks for next year.
-                    i = no1wkst+numweeks*7
-                    if no1wkst != firstwkst:
-                        i -= 7-firstwkst
-                    if i < self.yearlen:
-                        # If week starts in next year, we
-                        # don't care about it.
-                        for j in range(7):
-                            self.wnomask[i] = 1
-                            i += 1
-                            if self.wdaymask[i] == rr._wkst:
-                                break
-                if no1wkst:
-                    # Check last week number of last year as
-                    # well. If no1wkst is 0, either the year
-                    # started on week start, or week number 1
-                    # got days from last year, so there are no
-                    # days from last year's last week number in
-                    # this year.
-                    if -1 not in rr._byweekno:
-                        lyearweekday = datetime.date(year-1,1,1).weekday()
-                        lno1wkst = (7-lyearweekday+rr._wkst)%7
-                        lyearlen = 365+calendar.isleap(year-1)
-                        if lno1wkst >= 4:
-                            lno1wkst = 0
-                            lnumweeks = 52+(lyearlen+
-                                           (lyearweekday-rr._wkst)%7)%7//4
-                        else:
-                            lnumweeks = 52+(self.yearlen-no1wkst)%7//4
-                    else:
-                        lnumweeks = -1
-                    if lnumweeks in rr._byweekno:
-                        for i in range(no1wkst):
-                            self.wnomask[i] = 1
+                key = ("year", self.yearlen, self.yearweekday)
+            (self.mmask, self.mdaymask, self.nmdaymask, self.wdaymask,
+             self.mrange, self.wnomask) = \
+                _cachedmasks(key, self._buildyear, year)
 
         if (rr._bynweekday and
             (month != self.lastmonth or year != self.lastyear)):
-            ranges = []
+            ranges = None
             if rr._freq == YEARLY:
                 if rr._bymonth:
-                    for month in rr._bymonth:
-                        ranges.append(self.mrange[month-1:month+1])
+                    ranges = ("months", rr._bymonth)
                 else:
-                    ranges = [(0, self.yearlen)]
+                    ranges = ("year",)
             elif rr._freq == MONTHLY:
-                ranges = [self.mrange[month-1:month+1]]
+                ranges = ("months", (month,))
             if ranges:
-                # Weekly frequency won't get here, so we may not
-                # care about cross-year weekly periods.
-                self.nwdaymask = [0]*self.yearlen
-                for first, last in ranges:
-                    last -= 1
-                    for wday, n in rr._bynweekday:
-                        if n < 0:
-                            i = last+(n+1)*7
-                            i -= (self.wdaymask[i]-wday)%7
-                        else:
-                            i = first+(n-1)*7
-                            i += (7-self.wdaymask[i]+wday)%7
-                        if first <= i <= last:
-                            self.nwdaymask[i] = 1
+                key = ("nweekday", self.yearlen, self.yearweekday, ranges,
+                       rr._bynweekday)
+                self.nwdaymask = _cachedmasks(key, self._buildnwdaymask,
+                                              ranges)
 
         if rr._byeaster:
-            self.eastermask = [0]*(self.yearlen+7)
-            eyday = easter.easter(year).toordinal()-self.yearordinal
-            for offset in rr._byeaster:
-                self.eastermask[eyday+offset] = 1
+            key = ("easter", year, rr._byeaster)
+            self.eastermask = _cachedmasks(key, self._buildeastermask, year)
 
         self.lastyear = year
         self.lastmonth = month
 
+    def _buildyear(self, year):
+        rr = self.rrule
+        yearlen = self.yearlen
+        yearweekday = self.yearweekday
+
+        wday = yearweekday
+        if yearlen == 365:
+            mmask = M365MASK
+            mdaymask = MDAY365MASK
+            nmdaymask = NMDAY365MASK
+            wdaymask = WDAYMASK[wday:]
+            mrange = M365RANGE
+        else:
+            mmask = M366MASK
+            mdaymask = MDAY366MASK
+            nmdaymask = NMDAY366MASK
+            wdaymask = WDAYMASK[wday:]
+            mrange = M366RANGE
+
+        if not rr._byweekno:
+            wnomask = None
+        else:
+            wnomask = [0]*(yearlen+7)
+            #no1wkst = firstwkst = wdaymask.index(rr._wkst)
+            no1wkst = firstwkst = (7-yearweekday+rr._wkst)%7
+            if no1wkst >= 4:
+                no1wkst = 0
+                # Number of days in the year, plus the days we got
+                # from last year.
+                wyearlen = yearlen+(yearweekday-rr._wkst)%7
+            else:
+                # Number of days in the year, minus the days we
+                # left in last year.
+                wyearlen = yearlen-no1wkst
+            div, mod = divmod(wyearlen, 7)
+            numweeks = div+mod//4
+            for n in rr._byweekno:
+                if n < 0:
+                    n += numweeks+1
+                if not (0 < n <= numweeks):
+                    continue
+                if n > 1:
+                    i = no1wkst+(n-1)*7
+                    if no1wkst != firstwkst:
+                        i -= 7-firstwkst
+                else:
+                    i = no1wkst
+                for j in range(7):
+                    wnomask[i] = 1
+                    i += 1
+                    if wdaymask[i] == rr._wkst:
+                        break
+            if 1 in rr._byweekno:
+                # Check week number 1 of next year as well
+                # TODO: Check -numweeks for next year.
+                i = no1wkst+numweeks*7
+                if no1wkst != firstwkst:
+                    i -= 7-firstwkst
+                if i < yearlen:
+                    # If week starts in next year, we
+                    # don't care about it.
+                    for j in range(7):
+                        wnomask[i] = 1
+                        i += 1
+                        if wdaymask[i] == rr._wkst:
+                            break
+            if no1wkst:
+                # Check last week number of last year as
+                # well. If no1wkst is 0, either the year
+                # started on week start, or week number 1
+                # got days from last year, so there are no
+                # days from last year's last week number in
+                # this year.
+                if -1 not in rr._byweekno:
+                    lyearweekday = datetime.date(year-1,1,1).weekday()
+                    lno1wkst = (7-lyearweekday+rr._wkst)%7
+                    lyearlen = 365+calendar.isleap(year-1)
+                    if lno1wkst >= 4:
+                        lno1wkst = 0
+                        lnumweeks = 52+(lyearlen+
+                                       (lyearweekday-rr._wkst)%7)%7//4
+                    else:
+                        lnumweeks = 52+(yearlen-no1wkst)%7//4
+                else:
+                    lnumweeks = -1
+                if lnumweeks in rr._byweekno:
+                    for i in range(no1wkst):
+                        wnomask[i] = 1
+
+        return (mmask, mdaymask, nmdaymask, wdaymask, mrange, wnomask)
+
+    def _buildnwdaymask(self, ranges):
+        # Weekly frequency won't get here, so we may not
+        # care about cross-year weekly periods.
+        rr = self.rrule
+        if ranges[0] == "months":
+            ranges = [self.mrange[month-1:month+1] for month in ranges[1]]
+        else:
+            ranges = [(0, self.yearlen)]
+        nwdaymask = [0]*self.yearlen
+        for first, last in ranges:
+            last -= 1
+            for wday, n in rr._bynweekday:
+                if n < 0:
+                    i = last+(n+1)*7
+                    i -= (self.wdaymask[i]-wday)%7
+                else:
+                    i = first+(n-1)*7
+                    i += (7-self.wdaymask[i]+wday)%7
+                if first <= i <= last:
+                    nwdaymask[i] = 1
+        return nwdaymask
+
+    def _buildeastermask(self, year):
+        eastermask = [0]*(self.yearlen+7)
+        eyday = easter.easter(year).toordinal()-self.yearordinal
+        for offset in self.rrule._byeaster:
+            eastermask[eyday+offset] = 1
+        return eastermask
+
     def ydayset(self, year, month, day):
         return range(self.yearlen), 0, self.yearlen
 
@@ -12,6 +12,8 @@ import struct
 import time
 import sys
 import os
+import threading
+from bisect import bisect_right
 
 relativedelta = None
 parser = None
@@ -404,17 +406,36 @@ class tzfile(datetime.tzinfo):
                 self._trans_list[i] += laststdoffset
         self._trans_list = tuple(self._trans_list)
 
+        # Remember the range of the last lookup, as consecutive lookups
+        # usually fall between the same two transitions.  The transitions
+        # are searched as Python ints, since some of them don't fit in a
+        # 32-bit C long.
+        self._trans_cache = (0, 0, 0)
+
+    def _find_trans_idx(self, timestamp):
+        lo, hi, idx = self._trans_cache
+        if lo <= timestamp < hi:
+            return idx
+        trans_list = self._trans_list
+        idx = bisect_right(trans_list, timestamp)
+        if idx > 0:
+            lo = trans_list[idx-1]
+        else:
+            lo = float('-inf')
+        if idx < len(trans_list):
+            hi = trans_list[idx]
+        else:
+            hi = float('inf')
+        self._trans_cache = (lo, hi, idx)
+        return idx
+
     def _find_ttinfo(self, dt, laststd=0):
         timestamp = ((dt.toordinal() - EPOCHORDINAL) * 86400
                      + dt.hour * 3600
                      + dt.minute * 60
                      + dt.second)
-        idx = 0
-        for trans in self._trans_list:
-            if timestamp < trans:
-                break
-            idx += 1
-        else:
+        idx = self._find_trans_idx(timestamp)
+        if idx == len(self._trans_list):
             return self._ttinfo_std
         if idx == 0:
             return self._ttinfo_before
@@ -882,7 +903,47 @@ else:
     TZFILES = []
     TZPATHS = []
 
+_gettz_cache = {}
+_gettz_lock = threading.Lock()
+
 def gettz(name=None):
+    # Resolving a name walks TZPATHS and parses the zone file, so results
+    # are cached process-wide.  Zones read from a file are checked against
+    # the file's mtime on each hit, and reloaded if it changed.
+    if not name:
+        name = os.environ.get("TZ")
+    _gettz_lock.acquire()
+    try:
+        entry = _gettz_cache.get(name)
+    finally:
+        _gettz_lock.release()
+    if entry is not None:
+        tz, filename, mtime = entry
+        if filename is None:
+            return tz
+        try:
+            if os.stat(filename).st_mtime == mtime:
+                return tz
+        except OSError:
+            pass
+    tz = _gettz(name)
+    if tz is None:
+        return tz
+    filename = mtime = None
+    if isinstance(tz, tzfile) and os.path.isabs(tz._filename):
+        filename = tz._filename
+        try:
+            mtime = os.stat(filename).st_mtime
+        except OSError:
+            return tz
+    _gettz_lock.acquire()
+    try:
+        _gettz_cache[name] = (tz, filename, mtime)
+    finally:
+        _gettz_lock.release()
+    return tz
+
+def _gettz(name=None):
     tz = None
     if not name:
         try:
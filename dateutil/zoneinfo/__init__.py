@@ -6,16 +6,22 @@ datetime module.
 """
 from dateutil.tz import tzfile
 from tarfile import TarFile
+from StringIO import StringIO
+from collections import OrderedDict
 import os
+import tempfile
+import threading
 
 __author__ = "Gustavo Niemeyer <gustavo@niemeyer.net>"
 __license__ = "PSF License"
 
 __all__ = ["setcachesize", "gettz", "rebuild"]
 
-CACHE = []
+CACHE = OrderedDict()
 CACHESIZE = 10
 
+_lock = threading.Lock()
+
 class tzfile(tzfile):
     def __reduce__(self):
         return (gettz, (self._filename,))
@@ -34,27 +40,167 @@ ZONEINFOFILE = getzoneinfofile()
 del getzoneinfofile
 
 def setcachesize(size):
-    global CACHESIZE, CACHE
+    global CACHESIZE
     CACHESIZE = size
-    del CACHE[size:]
+    _lock.acquire()
+    try:
+        while len(CACHE) > CACHESIZE:
+            CACHE.popitem(last=False)
+    finally:
+        _lock.release()
+
+class _ZoneStore(object):
+    """
+    Uncompressed copy of the zoneinfo tarball, along with an index of where
+    each zone starts, so that a zone can be read with a single seek instead
+    of decompressing and scanning the whole archive.  The index records the
+    size and modification time of the tarball it was built from, and is
+    rebuilt whenever they change.
+    """
+    def __init__(self, source):
+        self._source = source
+        self._bundle = None
+        self._members = None
+
+    def _stamp(self):
+        st = os.stat(self._source)
+        return "%d %d" % (st.st_size, int(st.st_mtime))
+
+    def _paths(self, directory):
+        # NOTE: These names must not contain ".tar.", or they would be
+        # mistaken for the tarball itself.
+        basename = os.path.basename(self._source).split(".tar.")[0]
+        base = os.path.join(directory, basename)
+        return base + ".bundle", base + ".index"
+
+    def _read_index(self, bundle, index, stamp):
+        if not os.path.isfile(bundle):
+            return None
+        try:
+            fileobj = open(index)
+        except IOError:
+            return None
+        try:
+            if fileobj.readline().rstrip("\n") != stamp:
+                return None
+            members = {}
+            for line in fileobj:
+                name, offset, size = line.rstrip("\n").rsplit(" ", 2)
+                members[name] = (int(offset), int(size))
+            return members
+        except ValueError:
+            return None
+        finally:
+            fileobj.close()
+
+    def _build(self, bundle, index, stamp):
+        # Write to temporary files first, so that another process never
+        # sees a partially written bundle or index.
+        members = {}
+        links = []
+        tmpbundle = "%s.%d.tmp" % (bundle, os.getpid())
+        tmpindex = "%s.%d.tmp" % (index, os.getpid())
+        tf = TarFile.open(self._source)
+        try:
+            out = TarFile.open(tmpbundle, "w")
+            try:
+                for member in tf:
+                    if member.isfile():
+                        out.addfile(member, tf.extractfile(member))
+                        members[member.name] = (out.offset - member.size -
+                                                (-member.size % 512),
+                                                member.size)
+                    elif member.islnk():
+                        links.append((member.name, member.linkname))
+            finally:
+                out.close()
+        finally:
+            tf.close()
+        for name, linkname in links:
+            if linkname in members:
+                members[name] = members[linkname]
+        fileobj = open(tmpindex, "w")
+        try:
+            fileobj.write(stamp + "\n")
+            for name, (offset, size) in sorted(members.items()):
+                fileobj.write("%s %d %d\n" % (name, offset, size))
+        finally:
+            fileobj.close()
+        for tmppath, path in ((tmpbundle, bundle), (tmpindex, index)):
+            if os.path.exists(path):
+                os.remove(path)
+            os.rename(tmppath, path)
+        return members
+
+    def _open(self):
+        # Keep the bundle out of the package, unless there is nowhere else
+        # to write it.
+        stamp = self._stamp()
+        directories = [os.path.join(tempfile.gettempdir(), "dateutil-zoneinfo"),
+                       os.path.dirname(self._source)]
+        for directory in directories:
+            bundle, index = self._paths(directory)
+            members = self._read_index(bundle, index, stamp)
+            if members is None:
+                try:
+                    if not os.path.isdir(directory):
+                        os.makedirs(directory)
+                    members = self._build(bundle, index, stamp)
+                except (IOError, OSError):
+                    continue
+            self._bundle = bundle
+            self._members = members
+            return True
+        return False
+
+    def read(self, name):
+        """Return the contents of the named zone, or None if missing."""
+        if self._members is None and not self._open():
+            # Nowhere to keep the bundle, so read from the tarball.
+            tf = TarFile.open(self._source)
+            try:
+                try:
+                    return tf.extractfile(name).read()
+                except KeyError:
+                    return None
+            finally:
+                tf.close()
+        try:
+            offset, size = self._members[name]
+        except KeyError:
+            return None
+        fileobj = open(self._bundle, "rb")
+        try:
+            fileobj.seek(offset)
+            return fileobj.read(size)
+        finally:
+            fileobj.close()
+
+if ZONEINFOFILE:
+    _store = _ZoneStore(ZONEINFOFILE)
+else:
+    _store = None
 
 def gettz(name):
     tzinfo = None
-    if ZONEINFOFILE:
-        for cachedname, tzinfo in CACHE:
-            if cachedname == name:
-                break
-        else:
-            tf = TarFile.open(ZONEINFOFILE)
+    if _store:
+        _lock.acquire()
+        try:
             try:
-                zonefile = tf.extractfile(name)
+                tzinfo = CACHE.pop(name)
             except KeyError:
-                tzinfo = None
-            else:
-                tzinfo = tzfile(zonefile)
-            tf.close()
-            CACHE.insert(0, (name, tzinfo))
-            del CACHE[CACHESIZE:]
+                data = _store.read(name)
+                if data is not None:
+                    # Named like the tarball member, so pickling still works.
+                    fileobj = StringIO(data)
+                    fileobj.name = name
+                    tzinfo = tzfile(fileobj)
+            # Most recently used names are kept at the end.
+            CACHE[name] = tzinfo
+            while len(CACHE) > CACHESIZE:
+                CACHE.popitem(last=False)
+        finally:
+            _lock.release()
     return tzinfo
 
 def rebuild(filename, tag=None, format="gz"):
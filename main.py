@@ -1,4 +1,4 @@
-import base64, os, pickle, sys, urllib, urlparse
+import base64, os, sys, urllib, urlparse
 import xbmc, xbmcaddon, xbmcgui, xbmcplugin
 try:
 	import simplejson as json
@@ -9,6 +9,8 @@ import _strptime
 from datetime import datetime
 from dateutil import tz
 from distutils.version import StrictVersion
+from resources.lib.game import Game
+from resources.lib.localtime import LocalTime
 from resources.lib.nhlgc import nhlgc
 
 __addon__       = xbmcaddon.Addon()
@@ -23,11 +25,13 @@ __profile__     = __addon__.getAddonInfo('profile').decode('utf-8')
 __language__    = __addon__.getLocalizedString
 __teams_json__  = os.path.join(__cwd__, 'teams.json')
 __cookiesfile__ = xbmc.translatePath(os.path.join(__profile__, 'cookies.lwp'))
+__cachedir__    = xbmc.translatePath(os.path.join(__profile__, 'cache'))
 
 __addonversion__                 = __addon__.getAddonInfo('version')
 __clear_cookies_before_version__ = '0.0.31'
 
-game_time_format = xbmc.getRegion('dateshort') + ' ' + xbmc.getRegion('time').replace(':%S', '')
+game_date_format = xbmc.getRegion('dateshort')
+game_time_format = game_date_format + ' ' + xbmc.getRegion('time').replace(':%S', '')
 
 class NHL_GameCenter(object):
 	# This is the list of bitrates defined in settings.xml. These two sources
@@ -89,7 +93,8 @@ class NHL_GameCenter(object):
 
 		try:
 			clear_cookies = __addon__.getSetting('clear_cookies') == 'true' or StrictVersion(__addonversion__) < StrictVersion(__clear_cookies_before_version__)
-			self.game_center = nhlgc(username, password, rogerslogin, proxy_config, hls_server, __cookiesfile__, clear_cookies=clear_cookies)
+			probe_archived_streams = __addon__.getSetting('probe_archived_streams') == 'true'
+			self.game_center = nhlgc(username, password, rogerslogin, proxy_config, hls_server, __cookiesfile__, clear_cookies=clear_cookies, cache_dir=__cachedir__, probe_archived_streams=probe_archived_streams)
 			if clear_cookies:
 				__addon__.setSetting('clear_cookies_last_version', __addonversion__)
 			__addon__.setSetting('clear_cookies', 'false')
@@ -116,6 +121,8 @@ class NHL_GameCenter(object):
 		self.show_scores = __addon__.getSetting('show_scores') == 'true'
 		self.at_instead_of_vs = __addon__.getSetting('at_instead_of_vs') == 'true'
 		self.show_stream_duration = __addon__.getSetting('show_stream_duration') == 'true'
+		self.show_milestones = __addon__.getSetting('show_milestones') == 'true'
+		self.local_time = LocalTime()
 
 	def parse_teams_json(self, teams_file):
 		with open(teams_file) as file_obj:
@@ -125,31 +132,48 @@ class NHL_GameCenter(object):
 	def display_notification(self, msg):
 		xbmcgui.Dialog().ok(__language__(30035), str(msg))
 
+	def log_transfer_metrics(self):
+		# Every run is a new process, so log what this one transferred before
+		# the counts are lost.
+		metrics = self.game_center.get_transfer_metrics()
+		for endpoint in sorted(metrics):
+			stats = metrics[endpoint]
+			msg = '%s: %s: %d requests, %d bytes transferred, %d bytes decoded (%.2f), %s' % (
+				__addonname__,
+				endpoint,
+				stats['requests'],
+				stats['compressed'],
+				stats['decompressed'],
+				stats['ratio'],
+				', '.join(stats['encodings']),
+			)
+			xbmc.log(msg, xbmc.LOGDEBUG)
+
 	def build_game_info(self, game, title_suffix=''):
 		info = {
 			'genre': 'Hockey',
-#			'year': int(game['season']),
-			'episode': int(game['id']),
-			'season': int(game['season']),
+#			'year': int(game.season),
+			'episode': int(game.id),
+			'season': int(game.season),
 #			'cast': [
-#				self.team_info[game['home_team']]['full-name'],
-#				self.team_info[game['away_team']]['full-name'],
+#				self.team_info[game.home_team]['full-name'],
+#				self.team_info[game.away_team]['full-name'],
 #			],
 			'title': self.game_title(game)[0],
 			'duration': 0,
 		}
 		if len(title_suffix) > 0:
 			info['title'] += ' ' + title_suffix
-		if self.show_stream_duration and game['start_time'] is not None:
-			info['aired'] = game['start_time'].astimezone(tz.tzlocal()).strftime('%Y-%m-%d')
-			if game['end_time'] is not None:
+		if self.show_stream_duration and game.start_time is not None:
+			info['aired'] = self.local_time.strftime(game.start_time, '%Y-%m-%d')
+			if game.end_time is not None:
 				# FIXME: This is both correct and incorrect at the same time.
 				# It's correct because the start and end times are correct.
 				# It's incorrect because non-live streams don't have commercials.
 				#
 				# Times seem to be high by about 50 minutes, so lets just chop
 				# that time off and hope for the best.
-				time_delta = game['end_time'] - game['start_time']
+				time_delta = game.end_time - game.start_time
 				info['duration'] = str((time_delta.seconds / 60) - 50)
 		return info
 
@@ -199,12 +223,12 @@ class NHL_GameCenter(object):
 			listitem=item,
 		)
 
-	def select_bitrate(self, streams, prev_bitrate=None, adjust_bitrate=False):
-		sorted_streams = sorted(streams, key=int, reverse=True)
+	def select_bitrate(self, variants, prev_bitrate=None, adjust_bitrate=False):
+		# NOTE: The variants are already sorted from best to worst quality.
 
 		# Pick the best quality stream.
 		if self.preferred_bitrate == 1:
-			return sorted_streams[0]
+			return variants[0]
 
 		# Handle setting prev_bitrate for "fuzzy" matching.
 		if prev_bitrate is None:
@@ -216,20 +240,20 @@ class NHL_GameCenter(object):
 
 		# Pick a specific stream quality.
 		if (self.preferred_bitrate == 0 and prev_bitrate is not None) or self.preferred_bitrate > 1:
-			for bitrate in sorted_streams:
-				if int(bitrate) <= prev_bitrate:
-					return bitrate
+			for variant in variants:
+				if variant.kbps <= prev_bitrate:
+					return variant
 
 		# Ask what bitrate the user wants.
 		dialog = xbmcgui.Dialog()
 		xbmc.executebuiltin('Dialog.Close(busydialog)')
-		ret = dialog.select(__language__(30005), sorted_streams)
-		return sorted_streams[ret]
+		ret = dialog.select(__language__(30005), [variant.label() for variant in variants])
+		return variants[ret]
 
 	def game_title(self, game):
 		# Get the team names.
-		home_team = game['home_team']
-		away_team = game['away_team']
+		home_team = game.home_team
+		away_team = game.away_team
 		if self.team_info_key is not None:
 			if home_team in self.team_info:
 				home_team = self.team_info[home_team][self.team_info_key]
@@ -237,14 +261,14 @@ class NHL_GameCenter(object):
 				away_team = self.team_info[away_team][self.team_info_key]
 
 		# Get the score for the game.
-		home_team_score, away_team_score = game['home_goals'], game['away_goals']
+		home_team_score, away_team_score = game.home_goals, game.away_goals
 
 		# Get the required dates and times.
 		current_time_utc = datetime.utcnow().replace(tzinfo=tz.tzutc())
-		if game['start_time'] is not None:
-			start_time_local = game['start_time'].astimezone(tz.tzlocal()).strftime(game_time_format)
+		if game.start_time is not None:
+			start_time_local = self.local_time.strftime(game.start_time, game_time_format)
 		else:
-			start_time_local = game['date'].strftime(xbmc.getRegion('dateshort'))
+			start_time_local = datetime.strptime(game.date, '%Y-%m-%d').strftime(game_date_format)
 
 		# Start with the basic title of "Team vs Team".
 		lang_id = 30027
@@ -256,13 +280,13 @@ class NHL_GameCenter(object):
 
 		# Handle game status flags.
 		status_flags = ''
-		if game['blocked']:
+		if game.blocked:
 			status_flags = __language__(30022)
 		else:
-			if game['live']:
+			if game.live:
 				status_flags = __language__(30023)
-			elif game['ended']:
-				time_delta = current_time_utc - game['start_time']
+			elif game.ended:
+				time_delta = current_time_utc - game.start_time
 				# Any game that has ended and started within the last 12 hours
 				# get flagged as having recently ended.
 				if time_delta.seconds + (time_delta.days * 86400) < 43200:
@@ -270,7 +294,7 @@ class NHL_GameCenter(object):
 
 		# Handle showing the game score.
 		game_score = ''
-		if self.show_scores and (game['live'] or game['ended']) and home_team_score is not None and away_team_score is not None:
+		if self.show_scores and (game.live or game.ended) and home_team_score is not None and away_team_score is not None:
 			game_score = '(%s-%s)' % (home_team_score, away_team_score)
 
 		# Prepend the game start time.
@@ -294,7 +318,7 @@ class NHL_GameCenter(object):
 	def matchup_image(self, game):
 		image = None
 		try:
-			home_team, away_team = game['home_team'], game['away_team']
+			home_team, away_team = game.home_team, game.away_team
 			if 'alt-abbr' in self.team_info[home_team]:
 				home_team = self.team_info[home_team]['alt-abbr']
 			if 'alt-abbr' in self.team_info[away_team]:
@@ -304,11 +328,29 @@ class NHL_GameCenter(object):
 			pass
 		return image
 
-	def serialize_data(self, data):
-		return base64.b64encode(pickle.dumps(data, pickle.HIGHEST_PROTOCOL))
+	def milestone_label(self, milestone):
+		if milestone['type'] == self.game_center.MILESTONE_TYPE_BROADCAST_START:
+			return __language__(30070)
+		elif milestone['type'] == self.game_center.MILESTONE_TYPE_PERIOD_START:
+			return __language__(30071) % milestone['period']
+		return __language__(30072) % milestone['description']
+
+	def add_milestone_items(self, label, stream_url, game):
+		for milestone in game.milestones:
+			url = self.game_center.rewind_stream(stream_url, milestone['time'])
+			if url is None:
+				return
+			self.add_item(
+				label = label + self.milestone_label(milestone),
+				url   = url,
+				game  = game,
+			)
+
+	def serialize_data(self, game):
+		return base64.urlsafe_b64encode(game.serialize())
 
 	def unserialize_data(self, data):
-		return pickle.loads(base64.b64decode(data))
+		return Game.unserialize(base64.urlsafe_b64decode(data))
 
 	def MODE_list(self, today_only):
 		retry_args = {'mode': 'list'}
@@ -320,10 +362,10 @@ class NHL_GameCenter(object):
 		try:
 			games = self.game_center.get_game_list(today_only)
 			for game in games:
-				if game['event_id'] is None:
+				if game.event_id is None:
 					continue
 
-				if game['streams'][self.game_center.STREAM_TYPE_CONDENSED] is not None or game['streams'][self.game_center.STREAM_TYPE_HIGHLIGHTS] is not None:
+				if game.streams.get(self.game_center.STREAM_TYPE_CONDENSED) is not None or game.streams.get(self.game_center.STREAM_TYPE_HIGHLIGHTS) is not None:
 					params = {'mode': 'view_options'}
 				else:
 					params = {'mode': 'live'}
@@ -340,11 +382,11 @@ class NHL_GameCenter(object):
 	def MODE_view_options(self, game):
 		retry_args = {
 			'mode': 'view_options',
-			'game': game,
+			'game': self.serialize_data(game),
 		}
 
 		try:
-			event_info = self.game_center.get_event_info(game['event_id'])
+			event_info = self.game_center.get_event_info(game.event_id)
 			if event_info['blocked']:
 				self.display_notification(__language__(30066))
 				return
@@ -368,17 +410,18 @@ class NHL_GameCenter(object):
 		use_bitrate = None
 		for idx, (label, stream_type) in enumerate(extra_options):
 			try:
-				if game['streams'][stream_type] is None:
+				if game.streams.get(stream_type) is None:
 					continue
-				master_url = self.game_center.get_master_playlist(game['event_id'], game['streams'][stream_type])
+				master_url = self.game_center.get_master_playlist(game.event_id, game.streams.get(stream_type))
 				if master_url is None:
 					continue
 
-				playlists = self.game_center.get_stream_playlist(master_url)
-				use_bitrate = self.select_bitrate(playlists, prev_bitrate=use_bitrate, adjust_bitrate=(idx == 1))
+				variants = self.game_center.get_stream_playlist(master_url)
+				variant = self.select_bitrate(variants, prev_bitrate=use_bitrate, adjust_bitrate=(idx == 1))
+				use_bitrate = variant.kbps
 				self.add_item(
 					label = label,
-					url   = playlists[use_bitrate],
+					url   = variant.url,
 					game  = game,
 				)
 			except nhlgc.NetworkError as error:
@@ -392,11 +435,11 @@ class NHL_GameCenter(object):
 	def MODE_live(self, game):
 		retry_args = {
 			'mode': 'live',
-			'game': game,
+			'game': self.serialize_data(game),
 		}
 
 		try:
-			event_info = self.game_center.get_event_info(game['event_id'])
+			event_info = self.game_center.get_event_info(game.event_id)
 			if event_info['blocked']:
 				self.display_notification(__language__(30066))
 				return
@@ -405,29 +448,49 @@ class NHL_GameCenter(object):
 			self.add_item(label=__language__(30030), params=retry_args)
 			return
 
+		# Milestones change as the game progresses, so fetch them fresh.
+		if self.show_milestones and self.has_hls_proxy:
+			try:
+				game = self.game_center.get_game_info(game.id, milestones=True)[0]
+			except (nhlgc.NetworkError, nhlgc.LogicError, IndexError):
+				pass
+
 		perspectives = [
 			(__language__(30065), self.game_center.STREAM_PERSPECTIVE_NATIONAL),
 			(__language__(30025), self.game_center.STREAM_PERSPECTIVE_HOME),
 			(__language__(30026), self.game_center.STREAM_PERSPECTIVE_AWAY),
 			(__language__(30062), self.game_center.STREAM_PERSPECTIVE_FRENCH),
+			(__language__(30073), self.game_center.STREAM_PERSPECTIVE_MULTI_ANGLE),
+			(__language__(30074), self.game_center.STREAM_PERSPECTIVE_HOME_GOALIE),
+			(__language__(30075), self.game_center.STREAM_PERSPECTIVE_AWAY_GOALIE),
 		]
 
+		# A perspective can have more than one feed, so number any extras.
+		feeds = []
+		for label, stream_perspective in perspectives:
+			for feed_idx, playback_id in enumerate(game.streams.get_all(stream_perspective)):
+				if feed_idx > 0:
+					feeds.append(('%s %d' % (label, feed_idx + 1), playback_id))
+				else:
+					feeds.append((label, playback_id))
+
 		use_bitrate = None
-		for idx, (label, stream_perspective) in enumerate(perspectives):
-			if game['streams'][self.game_center.STREAM_TYPE_LIVE][stream_perspective] is None:
-				continue
+		for idx, (label, playback_id) in enumerate(feeds):
 			try:
-				master_url = self.game_center.get_master_playlist(game['event_id'], game['streams'][self.game_center.STREAM_TYPE_LIVE][stream_perspective])
+				master_url = self.game_center.get_master_playlist(game.event_id, playback_id)
 				if master_url is None:
 					continue
 
-				playlists = self.game_center.get_stream_playlist(master_url)
-				use_bitrate = self.select_bitrate(playlists, prev_bitrate=use_bitrate, adjust_bitrate=(idx == 1))
+				variants = self.game_center.get_stream_playlist(master_url)
+				variant = self.select_bitrate(variants, prev_bitrate=use_bitrate, adjust_bitrate=(idx == 1))
+				use_bitrate = variant.kbps
 				self.add_item(
 					label = label,
-					url   = playlists[use_bitrate],
+					url   = variant.url,
 					game  = game,
 				)
+				if self.show_milestones and self.has_hls_proxy:
+					self.add_milestone_items(label, variant.url, game)
 			except nhlgc.NetworkError as error:
 				if error.status_code != 404:
 					self.display_notification(error)
@@ -439,12 +502,12 @@ class NHL_GameCenter(object):
 	def MODE_watch_OLD(self, game, stream_type):
 		retry_args = {
 			'mode': 'watch',
-			'game': game,
+			'game': self.serialize_data(game),
 			'stream_type': stream_type,
 		}
 
 		if stream_type == self.game_center.STREAM_TYPE_HIGHLIGHTS:
-			highlights = self.game_center.get_game_highlights(game['season'], game['id'], game['season_type'])
+			highlights = self.game_center.get_game_highlights(game.season, game.id, game.season_type)
 			if 'home' in highlights and 'publishPoint' in highlights['home']:
 				self.add_item(label=__language__(30025), url=highlights['home']['publishPoint'], game=game)
 			if 'away' in highlights and 'publishPoint' in highlights['away']:
@@ -457,7 +520,7 @@ class NHL_GameCenter(object):
 			(__language__(30025), 'home', self.game_center.PERSPECTIVE_HOME),
 			(__language__(30026), 'away', self.game_center.PERSPECTIVE_AWAY),
 		]
-		if game['french_game'] == True:
+		if game.french_game == True:
 			perspectives += [(__language__(30062), 'french', self.game_center.PERSPECTIVE_FRENCH)]
 
 		seen_urls = {}
@@ -465,12 +528,12 @@ class NHL_GameCenter(object):
 		for label, stream_key, perspective in perspectives:
 			try:
 				from_start = False
-				if stream_type == self.game_center.STREAM_TYPE_LIVE and game['streams'][stream_key] is not None:
-					playlists = self.game_center.get_playlists_from_m3u8_url(game['streams'][stream_key])
+				if stream_type == self.game_center.STREAM_TYPE_LIVE and game.streams.get(stream_key) is not None:
+					playlists = self.game_center.get_playlists_from_m3u8_url(game.streams.get(stream_key))
 				else:
 					if stream_type == self.game_center.STREAM_TYPE_LIVE:
 						from_start = True
-					playlists = self.game_center.get_video_playlists(game['season'], game['id'], game['season_type'], stream_type, perspective)
+					playlists = self.game_center.get_video_playlists(game.season, game.id, game.season_type, stream_type, perspective)
 
 				if len(playlists) == 1:
 					stream_url = playlists.values()[0]
@@ -563,6 +626,7 @@ class NHL_GameCenter(object):
 ##
 
 cache_folder = True
+game_center  = None
 try:
 	mode = __addonargs__.get('mode', None)
 	if type(mode) == type(list()):
@@ -600,3 +664,6 @@ except RuntimeError:
 	pass
 
 xbmcplugin.endOfDirectory(__addonhandle__, cacheToDisc=cache_folder)
+
+if game_center is not None:
+	game_center.log_transfer_metrics()
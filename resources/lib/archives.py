@@ -0,0 +1,157 @@
+import re
+import threading
+from io import BytesIO
+from Queue import Empty, Queue
+try:
+	from xml.etree import cElementTree as ElementTree
+except ImportError:
+	from xml.etree import ElementTree
+
+ARCHIVED_GAME_FIELDS = (
+	'id',
+	'season',
+	'type',
+	'date',
+	'homeTeam',
+	'awayTeam',
+	'homeGoals',
+	'awayGoals',
+)
+
+class AccessDeniedError(Exception):
+	pass
+
+def _iterparse(body):
+	if isinstance(body, unicode):
+		body = body.encode('utf-8')
+	return ElementTree.iterparse(BytesIO(body.strip()), events=('end',))
+
+def parse_archived_seasons(body, min_season):
+	# Returns None when the response doesn't contain any seasons at all.
+	archives = None
+	for _, elem in _iterparse(body):
+		if elem.tag == 'code':
+			if elem.text == 'noaccess':
+				raise AccessDeniedError()
+		elif elem.tag == 'season':
+			if archives is None:
+				archives = []
+			season_id = elem.get('id')
+			if season_id is not None and int(season_id) >= min_season:
+				# Each "g" element is a date (MM/DD/YYYY) that has games.
+				months = []
+				seen_months = set()
+				for game_date in elem.findall('g'):
+					month = (game_date.text or '').split('/', 1)[0]
+					if month and month not in seen_months:
+						seen_months.add(month)
+						months.append(month)
+				if months:
+					archives.append({
+						'season': season_id,
+						'months': months,
+					})
+			elem.clear()
+	return archives
+
+def iter_archived_games(body):
+	# Yields a dict of only the fields that are needed for each game, and
+	# frees each game element once it has been read.
+	for _, elem in _iterparse(body):
+		if elem.tag == 'code':
+			if elem.text == 'noaccess':
+				raise AccessDeniedError()
+		elif elem.tag == 'game':
+			game = {}
+			for field in ARCHIVED_GAME_FIELDS:
+				game[field] = elem.findtext(field)
+			game['blocked']      = elem.find('blocked') is not None
+			game['isLive']       = elem.find('isLive') is not None
+			game['publishPoint'] = elem.findtext('program/publishPoint')
+			elem.clear()
+			yield game
+
+class ArchiveURLRule(object):
+	# Describes how the publish point of an archived game maps to the HLS
+	# playlists for each perspective on one CDN layout.
+	__slots__ = ('host', 'path_re', 'path_replacements', 'template', 'french_replacements')
+
+	def __init__(self, host, path_pattern, template, path_replacements=(), french_replacements=()):
+		self.host                = host
+		self.path_re             = re.compile(path_pattern)
+		self.template            = template
+		self.path_replacements   = tuple(path_replacements)
+		self.french_replacements = tuple(french_replacements)
+
+	def derive(self, publish_point):
+		# Returns the home, away, and French stream URLs.
+		orig_url, qs = publish_point.split('?', 1)
+		match = self.path_re.search(orig_url)
+		path = match.group(1) if match is not None else orig_url
+		for old, new in self.path_replacements:
+			path = path.replace(old, new)
+		url = self.template % (self.host, path)
+		french_url = url
+		for old, new in self.french_replacements:
+			french_url = french_url.replace(old, new)
+		return (
+			url + '?' + qs,
+			url.replace('_h_', '_a_') + '?' + qs,
+			french_url + '?' + qs,
+		)
+
+def _nhlmobile_rule(host):
+	return ArchiveURLRule(
+		host                = host,
+		path_pattern        = r'(u/nhlmobile/.*)$',
+		template            = '%s%s/v1/playlist.m3u8',
+		path_replacements   = (('/pc/', '/ced/'), ('.mp4', '')),
+		french_replacements = (('/vod/nhl/', '/vod/nhlfr/'), ('_h_', '_fr_')),
+	)
+
+# The first season that each CDN layout applies to, newest first.
+ARCHIVE_URL_RULES = (
+	(2012, ArchiveURLRule(
+		host                = 'http://nlds150.cdnak.neulion.com/',
+		path_pattern        = r'/(nlds_vod/.*)$',
+		template            = '%s%s.m3u8',
+		french_replacements = (('/nlds_vod/nhl/', '/nlds_vod/nhlfr/'), ('_h_', '_fr_'), ('_whole_2', '_whole_1')),
+	)),
+	(2011, _nhlmobile_rule('http://nhl.cdn.neulion.net/')),
+	(2010, _nhlmobile_rule('http://nhl.cdnllnwnl.neulion.net/')),
+)
+
+def archive_url_rule(season):
+	for first_season, rule in ARCHIVE_URL_RULES:
+		if season >= first_season:
+			return rule
+	return None
+
+def probe_urls(make_probe, urls, max_workers=8):
+	# Checks the URLs on a bounded pool of worker threads.  make_probe() is
+	# called once per worker, and returns a function that takes a URL and
+	# returns whether it is available, or None if that couldn't be told.
+	# Returns a dict of URL to result.
+	results = {}
+	queue = Queue()
+	for url in urls:
+		queue.put(url)
+
+	def worker():
+		probe = make_probe()
+		while True:
+			try:
+				url = queue.get_nowait()
+			except Empty:
+				return
+			results[url] = probe(url)
+
+	workers = []
+	for _ in range(min(max_workers, queue.qsize())):
+		thread = threading.Thread(target=worker)
+		thread.daemon = True
+		thread.start()
+		workers.append(thread)
+	for thread in workers:
+		thread.join()
+	return results
@@ -0,0 +1,23 @@
+from collections import OrderedDict
+from dateutil import parser, tz
+
+UTC = tz.tzutc()
+
+# Enough for every distinct start and milestone time in a few days of games.
+PARSE_CACHE_SIZE = 1024
+
+_parser = parser.parser()
+_parsed = OrderedDict()
+
+def parse_utc(value):
+	# Parses a date string from the APIs as a UTC time.  Many games share a
+	# start time, so results are kept in an LRU cache, which is safe as
+	# datetimes are immutable.
+	try:
+		result = _parsed.pop(value)
+	except KeyError:
+		result = _parser.parse(value).replace(tzinfo=UTC)
+	_parsed[value] = result
+	if len(_parsed) > PARSE_CACHE_SIZE:
+		_parsed.popitem(last=False)
+	return result
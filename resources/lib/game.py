@@ -0,0 +1,188 @@
+import calendar
+try:
+	import simplejson as json
+except ImportError:
+	import json
+from datetime import datetime
+from dateutil import tz
+
+UTC = tz.tzutc()
+
+def _to_timestamp(value):
+	if value is None:
+		return None
+	return calendar.timegm(value.utctimetuple())
+
+def _from_timestamp(value):
+	if value is None:
+		return None
+	return datetime.fromtimestamp(value, UTC)
+
+class StreamSet(object):
+	# NOTE: The slot names match the STREAM_PERSPECTIVE_* and STREAM_TYPE_*
+	# values in nhlgc, so streams can be looked up with get().  Each slot
+	# holds a list, as a game can have more than one feed per perspective.
+	__slots__ = (
+		'national',
+		'home',
+		'away',
+		'french',
+		'multi_angle',
+		'home_goalie',
+		'away_goalie',
+		'condensed',
+		'highlights',
+	)
+
+	def __init__(self, *values):
+		for idx, slot in enumerate(self.__slots__):
+			if idx < len(values) and values[idx]:
+				setattr(self, slot, list(values[idx]))
+			else:
+				setattr(self, slot, [])
+
+	def get(self, name):
+		# Returns the primary stream for the slot.
+		streams = getattr(self, name)
+		if streams:
+			return streams[0]
+		return None
+
+	def get_all(self, name):
+		return getattr(self, name)
+
+	def add(self, name, value):
+		streams = getattr(self, name)
+		if value not in streams:
+			streams.append(value)
+
+	def to_list(self):
+		return [getattr(self, slot) for slot in self.__slots__]
+
+	@classmethod
+	def from_list(cls, values):
+		return cls(*values)
+
+	def __eq__(self, other):
+		return isinstance(other, StreamSet) and self.to_list() == other.to_list()
+
+	def __ne__(self, other):
+		return not self.__eq__(other)
+
+class Game(object):
+	# Bump this whenever the serialized layout changes.
+	SERIAL_VERSION = 2
+
+	__slots__ = (
+		'season',
+		'season_type',
+		'id',
+		'event_id',
+		'blocked',
+		'live',
+		'ended',
+		'date',
+		'start_time',
+		'end_time',
+		'home_team',
+		'away_team',
+		'home_goals',
+		'away_goals',
+		'french_game',
+		'milestones',
+		'streams',
+	)
+
+	def __init__(self, season, season_type, id, date, home_team, away_team, event_id=None, blocked=False, live=False, ended=False, start_time=None, end_time=None, home_goals=None, away_goals=None, french_game=False, milestones=None, streams=None):
+		self.season      = season
+		self.season_type = season_type
+		self.id          = id
+		self.event_id    = event_id
+		self.blocked     = blocked
+		self.live        = live
+		self.ended       = ended
+		self.date        = date
+		self.start_time  = start_time
+		self.end_time    = end_time
+		self.home_team   = home_team
+		self.away_team   = away_team
+		self.home_goals  = home_goals
+		self.away_goals  = away_goals
+		self.french_game = french_game
+		self.milestones  = milestones if milestones is not None else []
+		self.streams     = streams if streams is not None else StreamSet()
+
+	def __eq__(self, other):
+		# Two records are the same game if they share a season and an ID,
+		# regardless of how current their status is.
+		return isinstance(other, Game) and self.id == other.id and self.season == other.season
+
+	def __ne__(self, other):
+		return not self.__eq__(other)
+
+	def __hash__(self):
+		return hash((self.season, self.id))
+
+	def __repr__(self):
+		return 'Game(%s, %s, %s @ %s)' % (self.season, self.id, self.away_team, self.home_team)
+
+	def serialize(self):
+		milestones = [
+			[milestone['type'], _to_timestamp(milestone['time']), milestone['period'], milestone['description']]
+			for milestone in self.milestones
+		]
+		return json.dumps([
+			self.SERIAL_VERSION,
+			self.season,
+			self.season_type,
+			self.id,
+			self.event_id,
+			self.blocked,
+			self.live,
+			self.ended,
+			self.date,
+			_to_timestamp(self.start_time),
+			_to_timestamp(self.end_time),
+			self.home_team,
+			self.away_team,
+			self.home_goals,
+			self.away_goals,
+			self.french_game,
+			milestones,
+			self.streams.to_list(),
+		], separators=(',', ':'))
+
+	@classmethod
+	def unserialize(cls, data):
+		values = json.loads(data)
+		if values[0] != cls.SERIAL_VERSION:
+			raise ValueError('Unsupported game record version %r.' % values[0])
+		(_, season, season_type, game_id, event_id, blocked, live, ended, game_date, start_time, end_time,
+			home_team, away_team, home_goals, away_goals, french_game, milestones, streams) = values
+		return cls(
+			season      = season,
+			season_type = season_type,
+			id          = game_id,
+			event_id    = event_id,
+			blocked     = blocked,
+			live        = live,
+			ended       = ended,
+			date        = game_date,
+			start_time  = _from_timestamp(start_time),
+			end_time    = _from_timestamp(end_time),
+			home_team   = home_team,
+			away_team   = away_team,
+			home_goals  = home_goals,
+			away_goals  = away_goals,
+			french_game = french_game,
+			milestones  = [
+				{
+					'type':        milestone_type,
+					'time':        _from_timestamp(milestone_time),
+					'period':      period,
+					'description': description,
+				}
+				for milestone_type, milestone_time, period, description in milestones
+			],
+			streams     = StreamSet.from_list(streams),
+		)
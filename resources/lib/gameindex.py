@@ -0,0 +1,100 @@
+import calendar
+from bisect import bisect_left, bisect_right, insort
+
+def _sort_key(game):
+	# Orders games by the schedule's date, and then by start time.
+	timestamp = 0
+	if game.start_time is not None:
+		timestamp = calendar.timegm(game.start_time.utctimetuple())
+	return (game.date, timestamp, game.id)
+
+class GameIndex(object):
+	# Keeps the games that have been seen ordered by date, so that date
+	# ranges and each team's most recent games can be looked up with a
+	# binary search instead of scanning every game.
+	def __init__(self):
+		self.__keys  = []
+		self.__games = []
+		self.__by_id = {}
+		self.__teams = {}
+
+	def __len__(self):
+		return len(self.__games)
+
+	def __contains__(self, game_id):
+		return game_id in self.__by_id
+
+	def __getitem__(self, game_id):
+		return self.__by_id[game_id][1]
+
+	def get(self, game_id, default=None):
+		entry = self.__by_id.get(game_id)
+		if entry is None:
+			return default
+		return entry[1]
+
+	def values(self):
+		return list(self.__games)
+
+	def add(self, game):
+		# Replaces any older record of the same game.
+		key = _sort_key(game)
+		entry = self.__by_id.get(game.id)
+		if entry is not None:
+			old_key, old_game = entry
+			if old_key == key and old_game.home_team == game.home_team and old_game.away_team == game.away_team:
+				self.__games[bisect_left(self.__keys, key)] = game
+				self.__by_id[game.id] = (key, game)
+				return
+			self.__remove(old_key, old_game)
+
+		idx = bisect_right(self.__keys, key)
+		self.__keys.insert(idx, key)
+		self.__games.insert(idx, game)
+		self.__by_id[game.id] = (key, game)
+		for team in (game.home_team, game.away_team):
+			insort(self.__teams.setdefault(team, []), key)
+
+	def __remove(self, key, game):
+		idx = bisect_left(self.__keys, key)
+		del self.__keys[idx]
+		del self.__games[idx]
+		for team in (game.home_team, game.away_team):
+			team_keys = self.__teams[team]
+			del team_keys[bisect_left(team_keys, key)]
+
+	def __slice(self, first_day, last_day):
+		# Days are ISO dates, so they sort correctly as strings.
+		lo = 0
+		hi = len(self.__keys)
+		if first_day is not None:
+			lo = bisect_left(self.__keys, (first_day,))
+		if last_day is not None:
+			hi = bisect_left(self.__keys, (last_day + '~',), lo)
+		return lo, hi
+
+	def between(self, first_day=None, last_day=None, newest_first=False):
+		# Returns the games played from first_day to last_day, inclusive.
+		# With newest_first, the days are in reverse order, but the games of
+		# each day are still in the order they start in.
+		lo, hi = self.__slice(first_day, last_day)
+		if not newest_first:
+			return self.__games[lo:hi]
+		games = []
+		end = hi
+		while end > lo:
+			start = bisect_left(self.__keys, (self.__keys[end - 1][0],), lo, end)
+			games.extend(self.__games[start:end])
+			end = start
+		return games
+
+	def team_games(self, team, last_day=None, limit=None):
+		# Returns the team's most recent games up to last_day, newest first.
+		team_keys = self.__teams.get(team, [])
+		hi = len(team_keys)
+		if last_day is not None:
+			hi = bisect_left(team_keys, (last_day + '~',))
+		lo = 0
+		if limit is not None:
+			lo = max(0, hi - limit)
+		return [self.__by_id[key[2]][1] for key in reversed(team_keys[lo:hi])]
@@ -0,0 +1,406 @@
+import calendar
+import re
+import urlparse
+from array import array
+from bisect import bisect_right
+from collections import deque
+from datetime import datetime, timedelta
+from dateutil import tz
+
+ATTRIBUTE_LIST_RE = re.compile(r'([A-Z0-9-]+)=("[^"]*"|[^,]*)')
+MEDIA_SEQUENCE_RE = re.compile(r'^#EXT-X-MEDIA-SEQUENCE:(\d+)', re.M)
+PROGRAM_DATE_TIME_RE = re.compile(r'(\d{4})-(\d{2})-(\d{2})T(\d{2}):(\d{2}):(\d{2})(?:\.(\d+))?(Z|[+-]\d{2}:?\d{2})?$')
+
+UTC = tz.tzutc()
+
+class Variant(object):
+	__slots__ = (
+		'uri',
+		'url',
+		'bandwidth',
+		'average_bandwidth',
+		'program_id',
+		'resolution',
+		'codecs',
+		'frame_rate',
+		'audio',
+	)
+
+	def __init__(self, uri, bandwidth=0, average_bandwidth=None, program_id=None, resolution=None, codecs=None, frame_rate=None, audio=None):
+		self.uri               = uri
+		self.url               = uri
+		self.bandwidth         = int(bandwidth)
+		self.average_bandwidth = average_bandwidth
+		self.program_id        = program_id
+		self.resolution        = resolution
+		self.codecs            = codecs
+		self.frame_rate        = frame_rate
+		self.audio             = audio
+
+	@property
+	def kbps(self):
+		return self.bandwidth / 1000
+
+	@property
+	def height(self):
+		if self.resolution is None:
+			return 0
+		return self.resolution[1]
+
+	def label(self):
+		label = '%d kbps' % self.kbps
+		if self.resolution is not None:
+			label += ' (%dx%d' % self.resolution
+			if self.frame_rate is not None:
+				label += ', %g fps' % self.frame_rate
+			label += ')'
+		return label
+
+	def __eq__(self, other):
+		return isinstance(other, Variant) and self.uri == other.uri
+
+	def __ne__(self, other):
+		return not self.__eq__(other)
+
+	def __hash__(self):
+		return hash(self.uri)
+
+	def __repr__(self):
+		return 'Variant(%r, %d)' % (self.uri, self.bandwidth)
+
+def sort_variants(variants):
+	# De-duplicate by URI (keeping the first occurrence), and order the
+	# variants from best to worst quality.
+	seen_uris = set()
+	unique = []
+	for variant in variants:
+		if variant.uri in seen_uris:
+			continue
+		seen_uris.add(variant.uri)
+		unique.append(variant)
+	unique.sort(key=lambda variant: (variant.bandwidth, variant.height, variant.frame_rate or 0), reverse=True)
+	return unique
+
+class Key(object):
+	__slots__ = ('method', 'uri', 'iv')
+
+	def __init__(self, method, uri=None, iv=None):
+		self.method = method
+		self.uri    = uri
+		self.iv     = iv
+
+class Segment(object):
+	__slots__ = (
+		'uri',
+		'duration',
+		'title',
+		'sequence',
+		'program_date_time',
+		'discontinuity',
+		'key',
+	)
+
+	def __init__(self, uri, duration, title=None, sequence=0, program_date_time=None, discontinuity=False, key=None):
+		self.uri               = uri
+		self.duration          = duration
+		self.title             = title
+		self.sequence          = sequence
+		self.program_date_time = program_date_time
+		self.discontinuity     = discontinuity
+		self.key               = key
+
+	def __repr__(self):
+		return 'Segment(%d, %r, %g)' % (self.sequence, self.uri, self.duration)
+
+def parse_attribute_list(value):
+	attributes = {}
+	for name, attr_value in ATTRIBUTE_LIST_RE.findall(value):
+		if attr_value[:1] == '"':
+			attr_value = attr_value[1:-1]
+		attributes[name] = attr_value
+	return attributes
+
+def parse_program_date_time(value):
+	match = PROGRAM_DATE_TIME_RE.match(value.strip())
+	if match is None:
+		return None
+	year, month, day, hour, minute, second, fraction, offset = match.groups()
+	microsecond = 0
+	if fraction is not None:
+		microsecond = int((fraction + '00000')[:6])
+	value = datetime(int(year), int(month), int(day), int(hour), int(minute), int(second), microsecond, UTC)
+	if offset is not None and offset != 'Z':
+		offset = offset.replace(':', '')
+		minutes = int(offset[1:3]) * 60 + int(offset[3:5])
+		if offset[0] == '+':
+			minutes = -minutes
+		value += timedelta(minutes=minutes)
+	return value
+
+def to_timestamp(value):
+	if isinstance(value, datetime):
+		return calendar.timegm(value.utctimetuple()) + value.microsecond / 1000000.0
+	return float(value)
+
+class SegmentIndex(object):
+	# Maps wall-clock times to segments.  Start times are derived from
+	# EXT-X-PROGRAM-DATE-TIME, and carried forward by the EXTINF durations of
+	# segments that don't have one, then binary searched.
+	__slots__ = ('max_segments', '_times', '_sequences', '_next_time')
+
+	def __init__(self, max_segments=None):
+		self.max_segments = max_segments
+		self._times       = array('d')
+		self._sequences   = array('l')
+		self._next_time   = None
+
+	def __len__(self):
+		return len(self._times)
+
+	@property
+	def start_time(self):
+		if not self._times:
+			return None
+		return datetime.fromtimestamp(self._times[0], UTC)
+
+	@property
+	def end_time(self):
+		if self._next_time is None:
+			return None
+		return datetime.fromtimestamp(self._next_time, UTC)
+
+	def append(self, segment):
+		if segment.program_date_time is not None:
+			start = to_timestamp(segment.program_date_time)
+		elif self._next_time is not None:
+			start = self._next_time
+		else:
+			# Nothing to anchor this segment to yet.
+			return
+		if self._times and start < self._times[-1]:
+			start = self._times[-1]
+		self._times.append(start)
+		self._sequences.append(segment.sequence)
+		self._next_time = start + segment.duration
+
+		# Trim in batches, so that appending stays cheap.
+		if self.max_segments is not None and len(self._times) > self.max_segments + self.max_segments / 4:
+			excess = len(self._times) - self.max_segments
+			del self._times[:excess]
+			del self._sequences[:excess]
+
+	def find(self, when):
+		# Returns the sequence number of the segment that contains the given
+		# time, and how far into that segment the time is.  Times before the
+		# first segment are clamped to the start of the first segment.
+		if not self._times:
+			return None, 0.0
+		when = to_timestamp(when)
+		idx = bisect_right(self._times, when) - 1
+		if idx < 0:
+			return self._sequences[0], 0.0
+		return self._sequences[idx], when - self._times[idx]
+
+def is_master_playlist(text):
+	return '#EXT-X-STREAM-INF:' in text
+
+def parse_master_playlist(text, base_url):
+	variants = []
+	stream_inf = None
+	for line in text.splitlines():
+		line = line.strip()
+		if not line:
+			continue
+		if line[0] != '#':
+			if stream_inf is None:
+				continue
+			resolution = None
+			if 'RESOLUTION' in stream_inf:
+				try:
+					width, height = stream_inf['RESOLUTION'].lower().split('x', 1)
+					resolution = (int(width), int(height))
+				except ValueError:
+					pass
+			frame_rate = None
+			if 'FRAME-RATE' in stream_inf:
+				frame_rate = float(stream_inf['FRAME-RATE'])
+			average_bandwidth = None
+			if 'AVERAGE-BANDWIDTH' in stream_inf:
+				average_bandwidth = int(stream_inf['AVERAGE-BANDWIDTH'])
+			variants.append(Variant(
+				uri               = urlparse.urljoin(base_url, line),
+				bandwidth         = stream_inf.get('BANDWIDTH', 0),
+				average_bandwidth = average_bandwidth,
+				program_id        = stream_inf.get('PROGRAM-ID'),
+				resolution        = resolution,
+				codecs            = stream_inf.get('CODECS'),
+				frame_rate        = frame_rate,
+				audio             = stream_inf.get('AUDIO'),
+			))
+			stream_inf = None
+		elif line.startswith('#EXT-X-STREAM-INF:'):
+			stream_inf = parse_attribute_list(line[18:])
+	return sort_variants(variants)
+
+class MediaPlaylist(object):
+	def __init__(self, base_url=None, max_segments=None):
+		self.base_url        = base_url
+		self.max_segments    = max_segments
+		self.version         = None
+		self.target_duration = None
+		self.media_sequence  = 0
+		self.playlist_type   = None
+		self.ended           = False
+		self.key             = None
+		self.segments        = deque(maxlen=max_segments)
+		self.index           = SegmentIndex(max_segments)
+
+		# Parser state that has to survive between calls to feed(), so that
+		# only newly appended lines need to be parsed.
+		self._source        = ''
+		self._partial       = ''
+		self._last_uri      = None
+		self._next_sequence = None
+		self._extinf        = None
+		self._pdt           = None
+		self._discontinuity = False
+
+	@property
+	def duration(self):
+		return sum(segment.duration for segment in self.segments)
+
+	def get_segment(self, sequence):
+		if not self.segments:
+			return None
+		idx = sequence - self.segments[0].sequence
+		if idx < 0 or idx >= len(self.segments):
+			return None
+		return self.segments[idx]
+
+	def segment_at(self, when):
+		sequence, offset = self.index.find(when)
+		if sequence is None or not self.segments:
+			return None, 0.0
+		# The index is trimmed in batches, so it can still hold segments that
+		# have already left the window.  Times in those, like times before
+		# the window, are clamped to the start of the first segment.
+		first = self.segments[0]
+		if sequence < first.sequence:
+			return first, 0.0
+		return self.get_segment(sequence), offset
+
+	def feed(self, text):
+		# Only complete lines are parsed.  A trailing partial line is held
+		# until either more text arrives, or close() is called.
+		text = self._partial + text
+		end = text.rfind('\n') + 1
+		self._partial = text[end:]
+		self._parse_lines(text[:end].splitlines())
+		return self
+
+	def close(self):
+		if self._partial:
+			partial, self._partial = self._partial, ''
+			self._parse_lines([partial])
+		return self
+
+	def update(self, text):
+		# Refreshing a live playlist should only cost as much as the segments
+		# that were added since the last refresh.  When the refreshed text
+		# merely has lines appended to what was already seen (EVENT
+		# playlists), parse the new tail.  When the window slid forward, use
+		# the media sequence to find where the known segments end.  Anything
+		# else means starting over.
+		seen = len(self._source)
+		if seen > 0 and text.startswith(self._source):
+			tail = text[seen:]
+		else:
+			tail = self._sliding_window_tail(text)
+			if tail is None:
+				self.__init__(self.base_url, self.max_segments)
+				tail = text
+		self._source = text
+		return self.feed(tail).close()
+
+	def _sliding_window_tail(self, text):
+		if self._last_uri is None or self._partial:
+			return None
+		match = MEDIA_SEQUENCE_RE.search(text)
+		media_sequence = int(match.group(1)) if match is not None else 0
+		if media_sequence < self.media_sequence or media_sequence >= self._next_sequence:
+			# Either the stream restarted, or segments were missed.
+			return None
+
+		# The last known segment is almost always near the end of the
+		# playlist, so search backwards for it.
+		end = len(text)
+		while True:
+			pos = text.rfind(self._last_uri, 0, end)
+			if pos <= 0:
+				return None
+			tail_pos = pos + len(self._last_uri)
+			if text[pos - 1] == '\n' and (tail_pos == len(text) or text[tail_pos] in '\r\n'):
+				break
+			end = pos
+		self.media_sequence = media_sequence
+		return text[tail_pos:]
+
+	def _parse_lines(self, lines):
+		segments = self.segments
+		index = self.index
+		for line in lines:
+			line = line.strip()
+			if not line:
+				continue
+			if line[0] != '#':
+				if self._extinf is None:
+					continue
+				if self._next_sequence is None:
+					self._next_sequence = self.media_sequence
+				duration, title = self._extinf
+				segment = Segment(
+					uri               = urlparse.urljoin(self.base_url, line) if self.base_url else line,
+					duration          = duration,
+					title             = title,
+					sequence          = self._next_sequence,
+					program_date_time = self._pdt,
+					discontinuity     = self._discontinuity,
+					key               = self.key,
+				)
+				segments.append(segment)
+				index.append(segment)
+				self._last_uri      = line
+				self._next_sequence += 1
+				self._extinf        = None
+				self._pdt           = None
+				self._discontinuity = False
+			elif line.startswith('#EXTINF:'):
+				duration, _, title = line[8:].partition(',')
+				self._extinf = (float(duration), title or None)
+			elif line.startswith('#EXT-X-PROGRAM-DATE-TIME:'):
+				self._pdt = parse_program_date_time(line[25:])
+			elif line == '#EXT-X-DISCONTINUITY':
+				self._discontinuity = True
+			elif line.startswith('#EXT-X-KEY:'):
+				attributes = parse_attribute_list(line[11:])
+				method = attributes.get('METHOD', 'NONE')
+				if method == 'NONE':
+					self.key = None
+				else:
+					uri = attributes.get('URI')
+					if uri is not None and self.base_url:
+						uri = urlparse.urljoin(self.base_url, uri)
+					self.key = Key(method, uri, attributes.get('IV'))
+			elif line.startswith('#EXT-X-MEDIA-SEQUENCE:'):
+				self.media_sequence = int(line[22:])
+			elif line.startswith('#EXT-X-TARGETDURATION:'):
+				self.target_duration = int(line[22:])
+			elif line.startswith('#EXT-X-PLAYLIST-TYPE:'):
+				self.playlist_type = line[21:]
+			elif line.startswith('#EXT-X-VERSION:'):
+				self.version = int(line[15:])
+			elif line == '#EXT-X-ENDLIST':
+				self.ended = True
+
+def parse_media_playlist(text, base_url=None, max_segments=None):
+	return MediaPlaylist(base_url, max_segments).update(text)
@@ -0,0 +1,139 @@
+import hashlib
+import os
+import time
+try:
+	import simplejson as json
+except ImportError:
+	import json
+
+class HTTPCache(object):
+	# Entries on disk that haven't been used for this many seconds are
+	# removed, and only the most recently used MAX_ENTRIES are kept.  This
+	# is checked at most once per PRUNE_INTERVAL seconds.
+	MAX_UNUSED_AGE = 30 * 24 * 60 * 60
+	MAX_ENTRIES    = 1000
+	PRUNE_INTERVAL = 24 * 60 * 60
+
+	def __init__(self, cache_dir=None):
+		self.cache_dir = cache_dir
+		self.__entries = {}
+		if cache_dir is not None and not os.path.isdir(cache_dir):
+			try:
+				os.makedirs(cache_dir)
+			except OSError:
+				# Fall back to only caching in memory.
+				self.cache_dir = None
+		if self.cache_dir is not None:
+			self.__maybe_prune()
+
+	def __maybe_prune(self):
+		# NOTE: The modification time of the marker file records when the
+		# cache was last pruned.
+		marker = os.path.join(self.cache_dir, '.pruned')
+		try:
+			if time.time() - os.path.getmtime(marker) < self.PRUNE_INTERVAL:
+				return
+		except OSError:
+			pass
+		self.prune()
+		try:
+			with open(marker, 'w'):
+				pass
+		except IOError:
+			pass
+
+	def prune(self):
+		# Entries are touched whenever they are loaded from disk, so their
+		# modification time is when they were last used.
+		entries = []
+		try:
+			names = os.listdir(self.cache_dir)
+		except OSError:
+			return
+		for name in names:
+			if not name.endswith('.json') and not name.endswith('.tmp'):
+				continue
+			path = os.path.join(self.cache_dir, name)
+			try:
+				entries.append((os.path.getmtime(path), path))
+			except OSError:
+				pass
+		entries.sort(reverse=True)
+		now = time.time()
+		for idx, (mtime, path) in enumerate(entries):
+			# Temporary files left behind by an interrupted store() are
+			# removed too, unless they might still be being written.
+			if path.endswith('.tmp'):
+				expired = mtime < now - 60
+			else:
+				expired = idx >= self.MAX_ENTRIES or mtime < now - self.MAX_UNUSED_AGE
+			if expired:
+				try:
+					os.remove(path)
+				except OSError:
+					pass
+
+	def key(self, method, url, params=None, data=None):
+		parts = [method.upper(), url]
+		for values in (params, data):
+			if values:
+				for name in sorted(values):
+					parts.append('%s=%s' % (name, values[name]))
+		return hashlib.sha1('\n'.join(parts).encode('utf-8')).hexdigest()
+
+	def __path(self, key):
+		return os.path.join(self.cache_dir, key + '.json')
+
+	def load(self, key, max_age=None):
+		# Entries older than max_age seconds are treated as missing.
+		entry = self.__entries.get(key)
+		if entry is None and self.cache_dir is not None:
+			try:
+				with open(self.__path(key)) as file_obj:
+					entry = json.load(file_obj)
+			except (IOError, ValueError):
+				return None
+			try:
+				os.utime(self.__path(key), None)
+			except OSError:
+				pass
+			self.__entries[key] = entry
+		if entry is not None and max_age is not None and time.time() - entry['stored_at'] > max_age:
+			return None
+		return entry
+
+	def store(self, key, body, etag=None, last_modified=None):
+		entry = {
+			'body':          body,
+			'etag':          etag,
+			'last_modified': last_modified,
+			'stored_at':     time.time(),
+		}
+		self.__entries[key] = entry
+		if self.cache_dir is None:
+			return entry
+
+		# Write to a temporary file first, so that a reader never sees a
+		# partially written entry.
+		path = self.__path(key)
+		tmp_path = path + '.tmp'
+		try:
+			with open(tmp_path, 'w') as file_obj:
+				json.dump(entry, file_obj)
+			if os.path.exists(path):
+				os.remove(path)
+			os.rename(tmp_path, path)
+		except (IOError, OSError):
+			pass
+		return entry
+
+	@staticmethod
+	def validators(entry):
+		headers = {}
+		if entry is None:
+			return headers
+		if entry.get('etag'):
+			headers['If-None-Match'] = entry['etag']
+		if entry.get('last_modified'):
+			headers['If-Modified-Since'] = entry['last_modified']
+		return headers
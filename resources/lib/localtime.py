@@ -0,0 +1,37 @@
+import calendar
+from dateutil import tz
+
+class LocalTime(object):
+	# Converts UTC times to local time for display.  Many games share a start
+	# time, and tzlocal() asks the OS about DST on every utcoffset() call, so
+	# UTC offsets are memoized per minute, and formatted strings per time and
+	# format.
+	def __init__(self, tzinfo=None):
+		if tzinfo is None:
+			tzinfo = tz.tzlocal()
+		self.tzinfo = tzinfo
+		self.__offsets = {}
+		self.__formatted = {}
+
+	def __offset(self, value, minute):
+		offset = self.__offsets.get(minute)
+		if offset is None:
+			# NOTE: utcoffset() on the converted time can be wrong for the
+			# ambiguous hour at the end of DST, so diff the wall times.
+			offset = value.astimezone(self.tzinfo).replace(tzinfo=None) - value.replace(tzinfo=None)
+			self.__offsets[minute] = offset
+		return offset
+
+	def convert(self, value):
+		offset = self.__offset(value, calendar.timegm(value.utctimetuple()) // 60)
+		return (value + offset).replace(tzinfo=self.tzinfo)
+
+	def strftime(self, value, fmt):
+		timestamp = calendar.timegm(value.utctimetuple())
+		key = (timestamp, fmt)
+		formatted = self.__formatted.get(key)
+		if formatted is None:
+			offset = self.__offset(value, timestamp // 60)
+			formatted = (value + offset).replace(tzinfo=None).strftime(fmt)
+			self.__formatted[key] = formatted
+		return formatted
@@ -0,0 +1,63 @@
+import urlparse
+
+def accept_encoding():
+	# Only ask for brotli when both the brotli module and a version of
+	# urllib3 that can decode it are available.
+	encodings = ['gzip', 'deflate']
+	try:
+		import brotli
+		from requests.packages.urllib3 import response
+		if hasattr(response, 'BrotliDecoder'):
+			encodings.append('br')
+	except ImportError:
+		pass
+	return ', '.join(encodings)
+
+ACCEPT_ENCODING = accept_encoding()
+
+class TransferMetrics(object):
+	def __init__(self):
+		self.__endpoints = {}
+
+	def endpoint(self, url):
+		parts = urlparse.urlsplit(url)
+		return '%s://%s%s' % (parts.scheme, parts.netloc, parts.path)
+
+	def record(self, response):
+		decompressed = len(response.content)
+		compressed = None
+		if hasattr(response.raw, 'tell'):
+			# urllib3 counts the bytes it read off the wire.
+			try:
+				compressed = response.raw.tell()
+			except (AttributeError, IOError, ValueError):
+				pass
+		if not compressed and 'Content-Length' in response.headers and response.headers.get('Content-Encoding'):
+			compressed = int(response.headers['Content-Length'])
+		if not compressed:
+			compressed = decompressed
+
+		endpoint = self.endpoint(response.url)
+		if endpoint not in self.__endpoints:
+			self.__endpoints[endpoint] = {
+				'requests':     0,
+				'compressed':   0,
+				'decompressed': 0,
+				'encodings':    set(),
+			}
+		stats = self.__endpoints[endpoint]
+		stats['requests']     += 1
+		stats['compressed']   += compressed
+		stats['decompressed'] += decompressed
+		stats['encodings'].add(response.headers.get('Content-Encoding', 'identity'))
+
+	def summary(self):
+		summary = {}
+		for endpoint, stats in self.__endpoints.items():
+			summary[endpoint] = dict(stats)
+			summary[endpoint]['encodings'] = sorted(stats['encodings'])
+			if stats['decompressed'] > 0:
+				summary[endpoint]['ratio'] = float(stats['compressed']) / stats['decompressed']
+			else:
+				summary[endpoint]['ratio'] = 1.0
+		return summary
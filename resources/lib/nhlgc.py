@@ -1,15 +1,22 @@
 import cookielib
-import m3u8
 import requests
 import urllib
-import xmltodict
 try:
 	import simplejson as json
 except ImportError:
 	import json
 from datetime import date
+from datetime import datetime
 from datetime import timedelta
-from dateutil import parser, tz
+from dateutil import tz
+from archives import AccessDeniedError, archive_url_rule, iter_archived_games, parse_archived_seasons, probe_urls
+from dates import parse_utc
+from game import Game
+from gameindex import GameIndex
+from httpcache import HTTPCache
+from metrics import ACCEPT_ENCODING, TransferMetrics
+from hls import MediaPlaylist, Variant, is_master_playlist, parse_master_playlist
+from season import SeasonCalendar, current_season, request_ranges, split_range
 from TLSAdapter import TLSAdapter
 
 class nhlgc(object):
@@ -57,14 +64,27 @@ class nhlgc(object):
 	GAME_STATUS_FINAL6               = '6'
 	GAME_STATUS_FINAL7               = '7'
 
+	MILESTONE_TYPE_BROADCAST_START = 'BROADCAST_START'
+	MILESTONE_TYPE_GOAL            = 'GOAL'
+	MILESTONE_TYPE_PERIOD_START    = 'PERIOD_START'
+
+	MILESTONE_TYPES = {
+		MILESTONE_TYPE_BROADCAST_START: True,
+		MILESTONE_TYPE_GOAL:            True,
+		MILESTONE_TYPE_PERIOD_START:    True,
+	}
+
 	MEDIA_FEED_TITLE_CONDENSED  = 'Extended Highlights'
 	MEDIA_FEED_TITLE_FULL       = 'NHLTV'
 	MEDIA_FEED_TITLE_HIGHLIGHTS = 'Recap'
 
-	MEDIA_FEED_TYPE_AWAY     = 'AWAY'
-	MEDIA_FEED_TYPE_FRENCH   = 'FRENCH'
-	MEDIA_FEED_TYPE_HOME     = 'HOME'
-	MEDIA_FEED_TYPE_NATIONAL = 'NATIONAL'
+	MEDIA_FEED_TYPE_AWAY        = 'AWAY'
+	MEDIA_FEED_TYPE_AWAY_GOALIE = 'AWAY_GOALIE'
+	MEDIA_FEED_TYPE_COMPOSITE   = 'COMPOSITE'
+	MEDIA_FEED_TYPE_FRENCH      = 'FRENCH'
+	MEDIA_FEED_TYPE_HOME        = 'HOME'
+	MEDIA_FEED_TYPE_HOME_GOALIE = 'HOME_GOALIE'
+	MEDIA_FEED_TYPE_NATIONAL    = 'NATIONAL'
 
 	PLAYBACK_SCENARIO_MOBILE        = 'HTTP_CLOUD_MOBILE'
 	PLAYBACK_SCENARIO_TABLET        = 'HTTP_CLOUD_TABLET'
@@ -84,10 +104,30 @@ class nhlgc(object):
 	STATUS_CODE_LOGIN_THROTTLED     = -3500
 	STATUS_CODE_SYSTEM_ERROR        = -4000
 
-	STREAM_PERSPECTIVE_AWAY     = 'away'
-	STREAM_PERSPECTIVE_FRENCH   = 'french'
-	STREAM_PERSPECTIVE_HOME     = 'home'
-	STREAM_PERSPECTIVE_NATIONAL = 'national'
+	STREAM_PERSPECTIVE_AWAY        = 'away'
+	STREAM_PERSPECTIVE_AWAY_GOALIE = 'away_goalie'
+	STREAM_PERSPECTIVE_FRENCH      = 'french'
+	STREAM_PERSPECTIVE_HOME        = 'home'
+	STREAM_PERSPECTIVE_HOME_GOALIE = 'home_goalie'
+	STREAM_PERSPECTIVE_MULTI_ANGLE = 'multi_angle'
+	STREAM_PERSPECTIVE_NATIONAL    = 'national'
+
+	# Maps an EPG (title, mediaFeedType) pair to the stream slot it fills.
+	# Condensed games and highlights don't have a feed type.
+	#
+	# NOTE: The goalie cam feed types are a best guess, based on the
+	# perspectives that the old system offered.
+	EPG_STREAM_SLOTS = {
+		(MEDIA_FEED_TITLE_FULL, MEDIA_FEED_TYPE_NATIONAL):    STREAM_PERSPECTIVE_NATIONAL,
+		(MEDIA_FEED_TITLE_FULL, MEDIA_FEED_TYPE_HOME):        STREAM_PERSPECTIVE_HOME,
+		(MEDIA_FEED_TITLE_FULL, MEDIA_FEED_TYPE_AWAY):        STREAM_PERSPECTIVE_AWAY,
+		(MEDIA_FEED_TITLE_FULL, MEDIA_FEED_TYPE_FRENCH):      STREAM_PERSPECTIVE_FRENCH,
+		(MEDIA_FEED_TITLE_FULL, MEDIA_FEED_TYPE_COMPOSITE):   STREAM_PERSPECTIVE_MULTI_ANGLE,
+		(MEDIA_FEED_TITLE_FULL, MEDIA_FEED_TYPE_HOME_GOALIE): STREAM_PERSPECTIVE_HOME_GOALIE,
+		(MEDIA_FEED_TITLE_FULL, MEDIA_FEED_TYPE_AWAY_GOALIE): STREAM_PERSPECTIVE_AWAY_GOALIE,
+		(MEDIA_FEED_TITLE_CONDENSED, None):                   STREAM_TYPE_CONDENSED,
+		(MEDIA_FEED_TITLE_HIGHLIGHTS, None):                  STREAM_TYPE_HIGHLIGHTS,
+	}
 
 	# NOTE: The server that hosts the 2009 and earlier seasons doesn't allow
 	# access to the videos (HTTP 403 code). I'm unsure if there is anything
@@ -98,7 +138,36 @@ class nhlgc(object):
 	# - http://snhlced.cdnak.neulion.net/s/nhl/svod/flv/2_1_nyr_tbl_0809c_Whole_h264_sd.mp4
 	MIN_ARCHIVED_SEASON = 2010
 
-	def __init__(self, username, password, rogers_login, proxy_config, hls_server, cookies_file, clear_cookies=False):
+	# Archives of past seasons never change, so they never go stale, but
+	# the cache still removes them when it's pruned.  Only the season index
+	# and months of the current season are refreshed, after this many
+	# seconds.
+	ARCHIVE_CURRENT_SEASON_MAX_AGE = 6 * 60 * 60
+
+	# Settings for checking that archived streams actually exist.
+	ARCHIVE_PROBE_MAX_AGE = 24 * 60 * 60
+	ARCHIVE_PROBE_TIMEOUT = 5
+	ARCHIVE_PROBE_WORKERS = 8
+
+	# Responses that mean an archived stream doesn't exist.  Anything else
+	# that isn't a success, and any network error, leaves the stream
+	# unprobed, so a flaky connection doesn't hide it.
+	ARCHIVE_PROBE_MISSING_STATUS = {
+		403: True,
+		404: True,
+		410: True,
+	}
+
+	# How many game IDs, or days of games, to ask for in a single schedule
+	# request.
+	MAX_GAMES_PER_REQUEST = 50
+	MAX_DAYS_PER_REQUEST  = 31
+
+	# Six hours of ~6 second segments, which matches how far back the HLS
+	# proxy allows a live game to be rewound.
+	LIVE_PLAYLIST_MAX_SEGMENTS = 3600
+
+	def __init__(self, username, password, rogers_login, proxy_config, hls_server, cookies_file, clear_cookies=False, cache_dir=None, probe_archived_streams=False):
 		self.__urls = {
 			# Old system
 			'archived-seasons': 'https://gamecenter.nhl.com/nhlgc/servlets/allarchives',
@@ -120,6 +189,12 @@ class nhlgc(object):
 		self.__username     = username
 		self.__password     = password
 		self.__rogers_login = rogers_login
+		self.__probe_archived_streams = probe_archived_streams
+		self.__games            = GameIndex()
+		self.__http_cache       = HTTPCache(cache_dir)
+		self.__metrics          = TransferMetrics()
+		self.__master_playlists = {}
+		self.__media_playlists  = {}
 		self.__hls_server = None
 		if hls_server is not None:
 			self.__hls_server = 'http://%s:%d' % (hls_server['host'], hls_server['port'])
@@ -144,7 +219,11 @@ class nhlgc(object):
 		self.__session = requests.Session()
 		self.__session.mount('https://', TLSAdapter())
 		self.__session.cookies = cookiejar
-		self.__session.headers = {'User-Agent': self.DEFAULT_USER_AGENT}
+		self.__session.headers = {
+			'User-Agent':      self.DEFAULT_USER_AGENT,
+			'Accept-Encoding': ACCEPT_ENCODING,
+		}
+		self.__session.hooks['response'].append(self.__record_transfer)
 		if proxy_config is not None:
 			proxy_url = self.__build_proxy_url(proxy_config)
 			self.__session.proxies = {
@@ -213,6 +292,19 @@ class nhlgc(object):
 
 		return proxy_url
 
+	def __record_transfer(self, r, *args, **kwargs):
+		self.__metrics.record(r)
+
+	def __direct_get(self, url, **kwargs):
+		# Some requests deliberately bypass the session, but should still
+		# negotiate compression and be accounted for.
+		kwargs['headers'] = dict(kwargs.get('headers') or {}, **{'Accept-Encoding': ACCEPT_ENCODING})
+		kwargs['hooks'] = {'response': self.__record_transfer}
+		return requests.get(url, **kwargs)
+
+	def get_transfer_metrics(self):
+		return self.__metrics.summary()
+
 	def __save_cookies(self):
 		cookiejar = self.__session.cookies
 		cookiejar.save(ignore_discard=True)
@@ -349,33 +441,123 @@ class nhlgc(object):
 			raise self.LoginError()
 		self.__access_token = r_json['access_token']
 
-	def get_game_list(self, today_only=True):
+	def __game_info_expand(self, milestones=False):
+		# NOTE: Expanding schedule.game.content.media.milestones gives access
+		# to BROADCAST_START, period starts, and goals, which can be used as
+		# seek targets when rewinding a stream.
+		if milestones == True:
+			return 'schedule.game.content.media.milestones,schedule.game.content.media.epg,schedule.teams'
+		return 'schedule.game.content.media.epg,schedule.teams'
+
+	def get_game_list(self, today_only=True, milestones=False):
 		fn_name = 'get_game_list'
 
-		# NOTE: If we also expand schedule.game.content.media.milestones, we
-		# gain access to BROADCAST_START, which could be helpful for getting
-		# live rewinding to work again.
 		params = {
-#			'expand': 'schedule.game.content.media.milestones,schedule.game.content.media.epg,schedule.teams',
-			'expand': 'schedule.game.content.media.epg,schedule.teams',
+			'expand': self.__game_info_expand(milestones),
 		}
 		today = date.today()
 		if today_only == True:
 			params['date'] = today.isoformat()
-		else:
-			params['startDate'] = (today - timedelta(days=8)).isoformat()
-			params['endDate']   = (today - timedelta(days=1)).isoformat()
+			return self.__common_game_info(fn_name, params)
+		return self.__games_between(fn_name, today - timedelta(days=8), today - timedelta(days=1), milestones)
+
+	def get_games_between(self, start_date, end_date, milestones=False):
+		fn_name = 'get_games_between'
+
+		return self.__games_between(fn_name, start_date, end_date, milestones)
+
+	def prefetch_season(self, season=None, season_types=None, milestones=False):
+		fn_name = 'prefetch_season'
+
+		# Fetches every game of the season (or only of some season types) in
+		# as few schedule requests as possible, so that later lookups can be
+		# answered from memory.
+		if season is None:
+			season = current_season()
+		days = SeasonCalendar(season).game_days(season_types)
+		if len(days) == 0:
+			return []
+		self.__fetch_ranges(fn_name, request_ranges(days, self.MAX_DAYS_PER_REQUEST), milestones)
+		return self.__games.between(days[0].isoformat(), days[-1].isoformat(), newest_first=True)
+
+	def get_cached_games(self, start_date=None, end_date=None):
+		# Returns the games that have already been fetched, without making
+		# any requests, newest first.
+		return self.__games.between(
+			start_date.isoformat() if start_date is not None else None,
+			end_date.isoformat() if end_date is not None else None,
+			newest_first=True,
+		)
 
-		return self.__common_game_info(fn_name, params)
+	def get_team_games(self, team, end_date=None, limit=10):
+		# Returns the team's most recent games that have already been
+		# fetched, newest first.
+		return self.__games.team_games(team, end_date.isoformat() if end_date is not None else None, limit)
+
+	def __games_between(self, fn_name, start_date, end_date, milestones):
+		# NOTE: The season calendar is only used to plan prefetches, as an
+		# explicit range could contain games outside of its estimates.
+		self.__fetch_ranges(fn_name, split_range(start_date, end_date, self.MAX_DAYS_PER_REQUEST), milestones)
+		# NOTE: The index is already in the order that the list is shown in,
+		# newest day first and each day by start time.
+		return self.__games.between(start_date.isoformat(), end_date.isoformat(), newest_first=True)
+
+	def __fetch_ranges(self, fn_name, ranges, milestones):
+		# Merges the games into the index.
+		for first, last in ranges:
+			params = {
+				'startDate': first.isoformat(),
+				'endDate':   last.isoformat(),
+				'expand':    self.__game_info_expand(milestones),
+			}
+			try:
+				list(self.__common_game_info(fn_name, params))
+			except self.LogicError:
+				# No games were played in this range.
+				pass
 
-	def get_game_info(self, game_id):
+	def get_game_info(self, game_id, milestones=False):
 		fn_name = 'get_game_info'
 
 		params = {
 			'gamePk': game_id,
-			'expand': 'schedule.game.content.media.epg,schedule.teams',
+			'expand': self.__game_info_expand(milestones),
 		}
-		return self.__common_game_info(fn_name, params)
+		return list(self.__common_game_info(fn_name, params))
+
+	def get_games_info(self, game_ids, milestones=False):
+		fn_name = 'get_games_info'
+
+		# De-duplicate the IDs, keeping the order they were asked for in.
+		unique_ids = []
+		seen_ids = set()
+		for game_id in game_ids:
+			game_id = int(game_id)
+			if game_id not in seen_ids:
+				seen_ids.add(game_id)
+				unique_ids.append(game_id)
+
+		# Only ask for the games that haven't already been seen.
+		missing_ids = []
+		for game_id in unique_ids:
+			game = self.__games.get(game_id)
+			if game is None or (milestones == True and not game.milestones):
+				missing_ids.append(game_id)
+
+		# NOTE: The schedule endpoint accepts a comma separated list of game
+		# IDs through the gamePks parameter.
+		for idx in range(0, len(missing_ids), self.MAX_GAMES_PER_REQUEST):
+			params = {
+				'gamePks': ','.join(str(game_id) for game_id in missing_ids[idx:idx + self.MAX_GAMES_PER_REQUEST]),
+				'expand':  self.__game_info_expand(milestones),
+			}
+			try:
+				list(self.__common_game_info(fn_name, params))
+			except self.LogicError:
+				# None of the games in this batch were found.
+				pass
+
+		return [self.__games[game_id] for game_id in unique_ids if game_id in self.__games]
 
 	def __is_game_live(self, status_code):
 		if status_code == self.GAME_STATUS_IN_PROGRESS or status_code == self.GAME_STATUS_IN_PROGRESS_CRITICAL or status_code == self.GAME_STATUS_UNKNOWN5:
@@ -387,96 +569,169 @@ class nhlgc(object):
 			return True
 		return False
 
-	def __common_game_info(self, fn_name, params):
+	def __parse_milestones(self, media):
+		milestones = []
+		if 'milestones' not in media or 'items' not in media['milestones']:
+			return milestones
+		for item in media['milestones']['items']:
+			if item.get('type') not in self.MILESTONE_TYPES or not item.get('timeAbsolute'):
+				continue
+			milestones.append({
+				'type':        item['type'],
+				'time':        parse_utc(item['timeAbsolute']),
+				'period':      item.get('ordinalNum', item.get('period')),
+				'description': item.get('description', ''),
+			})
+		return sorted(milestones, key=lambda milestone: milestone['time'])
+
+	def __conditional_request(self, fn_name, requester, method, url, **kwargs):
+		# Sends the validators of any previously cached response, so that an
+		# unchanged response costs a 304 instead of the full body.  Returns
+		# the status code and the body of the response.
+		cache_key = self.__http_cache.key(method, url, kwargs.get('params'), kwargs.get('data'))
+		entry = self.__http_cache.load(cache_key)
+		headers = HTTPCache.validators(entry)
+		headers['Accept-Encoding'] = ACCEPT_ENCODING
+		if requester is requests:
+			kwargs['hooks'] = {'response': self.__record_transfer}
 		try:
-			r = requests.get(self.__urls['game-info'], params=params, cookies=None)
+			r = requester.request(method, url, headers=headers, **kwargs)
 		except requests.exceptions.ConnectionError as error:
 			raise self.NetworkError(fn_name, error)
 
+		if r.status_code == 304 and entry is not None:
+			return 200, entry['body']
+		if r.status_code == 200:
+			etag = r.headers.get('ETag')
+			last_modified = r.headers.get('Last-Modified')
+			if etag is not None or last_modified is not None:
+				self.__http_cache.store(cache_key, r.text, etag, last_modified)
+		return r.status_code, r.text
+
+	def __get_schedule(self, fn_name, params):
+		status_code, body = self.__conditional_request(fn_name, requests, 'GET', self.__urls['game-info'], params=params, cookies=None)
+
 		# Error handling.
-		if r.status_code != 200:
-			raise self.NetworkError(fn_name, self.NETWORK_ERR_NON_200, r.status_code)
+		if status_code != 200:
+			raise self.NetworkError(fn_name, self.NETWORK_ERR_NON_200, status_code)
 
-		r_json = json.loads(r.text)
+		return json.loads(body)
+
+	def poll_live_games(self, games=None):
+		fn_name = 'poll_live_games'
+
+		# Updates the status and score of the games that have started, and
+		# returns the ones that changed.
+		#
+		# NOTE: The add-on doesn't use this, as every plugin invocation is a
+		# new process that has no games to refresh.  It's meant for callers
+		# that keep this object around (e.g. a service), and they decide how
+		# often to poll.  By default, the games fetched by this object are
+		# polled.
+		now = datetime.utcnow().replace(tzinfo=tz.tzutc())
+		if games is None:
+			games = self.__games.values()
+		polled = {}
+		for game in games:
+			if not game.ended and game.start_time is not None and game.start_time <= now + timedelta(minutes=15):
+				polled[int(game.id)] = game
+
+		changed = []
+		if len(polled) > 0:
+			# Without any expansions, the schedule only contains the status
+			# and score of each game, which is all that is needed here.
+			polled_ids = sorted(polled)
+			for idx in range(0, len(polled_ids), self.MAX_GAMES_PER_REQUEST):
+				params = {
+					'gamePks': ','.join(str(game_id) for game_id in polled_ids[idx:idx + self.MAX_GAMES_PER_REQUEST]),
+				}
+				r_json = self.__get_schedule(fn_name, params)
+				for current_date in r_json.get('dates', []):
+					for game_json in current_date['games']:
+						game = polled.get(game_json['gamePk'])
+						if game is None:
+							continue
+						status_code = game_json['status']['statusCode']
+						delta = (
+							self.__is_game_live(status_code),
+							self.__is_game_ended(status_code),
+							game_json['teams']['home'].get('score'),
+							game_json['teams']['away'].get('score'),
+						)
+						if delta != (game.live, game.ended, game.home_goals, game.away_goals):
+							game.live, game.ended, game.home_goals, game.away_goals = delta
+							changed.append(game)
+		return changed
+
+	def __common_game_info(self, fn_name, params):
+		# Returns a generator of the games, newest day first and each day's
+		# games by start time.  The request is made, and checked for errors,
+		# before returning.
+		r_json = self.__get_schedule(fn_name, params)
 		try:
-			dates_list = sorted(r_json['dates'], key=lambda date: parser.parse(date['date']), reverse=True)
+			dates_list = r_json['dates']
 		except KeyError:
 			raise self.LogicError(fn_name, 'No games found.')
+		return self.__iter_game_info(dates_list)
 
-		all_games = []
-		for current_date in dates_list:
-			day_games = []
+	def __in_order(self, items, key):
+		for idx in range(1, len(items)):
+			if items[idx][key] < items[idx - 1][key]:
+				return False
+		return True
+
+	def __iter_game_info(self, dates_list):
+		# NOTE: The schedule lists the dates oldest first, and each day's
+		# games by start time, so the order usually only has to be reversed.
+		# The dates are ISO dates, and the start times ISO times in UTC, so
+		# both can be compared without parsing them.
+		if not self.__in_order(dates_list, 'date'):
+			dates_list = sorted(dates_list, key=lambda date: date['date'])
+		for current_date in reversed(dates_list):
 			games_list = current_date['games']
+			if not self.__in_order(games_list, 'gameDate'):
+				games_list = sorted(games_list, key=lambda game: game['gameDate'])
 			for game in games_list:
-				info = {
-					'season':      game['season'],
-					'season_type': game['gameType'],
-					'id':          game['gamePk'],
-					'event_id':    None,
-					'blocked':     False,
-					'live':        self.__is_game_live(game['status']['statusCode']),
-					'ended':       self.__is_game_ended(game['status']['statusCode']),
-					'date':        current_date['date'],
-					'start_time':  parser.parse(game['gameDate']).replace(tzinfo=tz.tzutc()),
-					'end_time':    None,
-					'home_team':   game['teams']['home']['team']['abbreviation'],
-					'away_team':   game['teams']['away']['team']['abbreviation'],
-					'home_goals':  game['teams']['home']['score'],
-					'away_goals':  game['teams']['away']['score'],
-					'french_game': False,
-					'streams':     {
-						self.STREAM_TYPE_LIVE: {
-							self.STREAM_PERSPECTIVE_NATIONAL: None,
-							self.STREAM_PERSPECTIVE_HOME:     None,
-							self.STREAM_PERSPECTIVE_AWAY:     None,
-							self.STREAM_PERSPECTIVE_FRENCH:   None,
-						},
-						self.STREAM_TYPE_CONDENSED:  None,
-						self.STREAM_TYPE_HIGHLIGHTS: None,
-					},
-				}
+				info = Game(
+					season      = game['season'],
+					season_type = game['gameType'],
+					id          = game['gamePk'],
+					live        = self.__is_game_live(game['status']['statusCode']),
+					ended       = self.__is_game_ended(game['status']['statusCode']),
+					date        = current_date['date'],
+					start_time  = parse_utc(game['gameDate']),
+					home_team   = game['teams']['home']['team']['abbreviation'],
+					away_team   = game['teams']['away']['team']['abbreviation'],
+					home_goals  = game['teams']['home']['score'],
+					away_goals  = game['teams']['away']['score'],
+				)
 
 				# Set the streams.
 				# FIXME: This check could probably be handled better?
 				if 'media' not in game['content']:
 					continue
+				info.milestones = self.__parse_milestones(game['content']['media'])
+				epg_stream_slots = self.EPG_STREAM_SLOTS
 				for epg_media in game['content']['media']['epg']:
 					if 'title' not in epg_media or 'items' not in epg_media:
 						continue
-
-					if epg_media['title'] == self.MEDIA_FEED_TITLE_FULL:
-						stream_type = self.STREAM_TYPE_LIVE
-						for epg_item in epg_media['items']:
-							stream_perspective = None
-							if epg_item['mediaFeedType'] == self.MEDIA_FEED_TYPE_NATIONAL:
-								stream_perspective = self.STREAM_PERSPECTIVE_NATIONAL
-							elif epg_item['mediaFeedType'] == self.MEDIA_FEED_TYPE_HOME:
-								stream_perspective = self.STREAM_PERSPECTIVE_HOME
-							elif epg_item['mediaFeedType'] == self.MEDIA_FEED_TYPE_AWAY:
-								stream_perspective = self.STREAM_PERSPECTIVE_AWAY
-							elif epg_item['mediaFeedType'] == self.MEDIA_FEED_TYPE_FRENCH:
-								stream_perspective = self.STREAM_PERSPECTIVE_FRENCH
-								info['french_game'] = True
-
-							if stream_perspective is not None:
-								info['event_id']                                 = epg_item['eventId']
-								info['streams'][stream_type][stream_perspective] = epg_item['mediaPlaybackId']
-					elif epg_media['title'] == self.MEDIA_FEED_TITLE_CONDENSED:
-						stream_type = self.STREAM_TYPE_CONDENSED
-						for epg_item in epg_media['items']:
-							if 'type' in epg_item and epg_item['type'] == 'video':
-								info['streams'][stream_type] = epg_item['mediaPlaybackId']
-					elif epg_media['title'] == self.MEDIA_FEED_TITLE_HIGHLIGHTS:
-						stream_type = self.STREAM_TYPE_HIGHLIGHTS
-						for epg_item in epg_media['items']:
-							if 'type' in epg_item and epg_item['type'] == 'video':
-								info['streams'][stream_type] = epg_item['mediaPlaybackId']
-
-				day_games.append(info)
-			# Sort the games for the day by the game's start time.
-			for game in sorted(day_games, key=lambda game: game['start_time']):
-				all_games.append(game)
-		return all_games
+					epg_title = epg_media['title']
+					for epg_item in epg_media['items']:
+						feed_type = epg_item.get('mediaFeedType')
+						stream_slot = epg_stream_slots.get((epg_title, feed_type))
+						if stream_slot is None or 'mediaPlaybackId' not in epg_item:
+							continue
+						if feed_type is None:
+							if epg_item.get('type') != 'video':
+								continue
+						elif info.event_id is None:
+							info.event_id = epg_item['eventId']
+						info.streams.add(stream_slot, epg_item['mediaPlaybackId'])
+				if info.streams.french:
+					info.french_game = True
+
+				self.__games.add(info)
+				yield info
 
 	def __set_session_key(self, session_key):
 		self.__session_key = session_key
@@ -613,22 +868,84 @@ class nhlgc(object):
 	def get_stream_playlist(self, master_url):
 		fn_name = 'get_stream_playlist'
 
-		playlists = {}
+		# Master playlists don't change for the lifetime of the URL, so only
+		# ever parse each one once.
+		if master_url in self.__master_playlists:
+			return self.__master_playlists[master_url]
+
 		try:
 			r = self.__session.get(master_url)
 			if r.status_code != 200:
 				raise self.NetworkError(fn_name, self.NETWORK_ERR_NON_200, r.status_code)
-			playlist_obj = m3u8.loads(r.text)
-			if playlist_obj.is_variant:
-				for playlist in playlist_obj.playlists:
-					bitrate = str(int(playlist.stream_info.bandwidth) / 1000)
-					playlists[bitrate] = master_url[:master_url.rfind('/') + 1] + playlist.uri + '|' + urllib.urlencode(self.__playlist_headers)
+			if is_master_playlist(r.text):
+				variants = parse_master_playlist(r.text, master_url)
 			else:
-				playlists['0'] = master_url + '|' + urllib.urlencode(self.__playlist_headers)
+				variants = [Variant(master_url)]
 		except requests.exceptions.ConnectionError as error:
 			raise self.NetworkError(fn_name, error)
 
-		return playlists
+		protocol_headers = '|' + urllib.urlencode(self.__playlist_headers)
+		for variant in variants:
+			variant.url = variant.uri + protocol_headers
+		self.__master_playlists[master_url] = variants
+		return variants
+
+	def __fetch_media_playlist(self, fn_name, m3u8_url):
+		try:
+			r = self.__direct_get(m3u8_url)
+		except requests.exceptions.ConnectionError as error:
+			raise self.NetworkError(fn_name, error)
+		if r.status_code != 200:
+			raise self.NetworkError(fn_name, self.NETWORK_ERR_NON_200, r.status_code)
+
+		# Keep the parsed playlist around, so that fetching it again only
+		# parses what changed.  That only happens within one process.
+		if m3u8_url not in self.__media_playlists:
+			self.__media_playlists[m3u8_url] = MediaPlaylist(m3u8_url, self.LIVE_PLAYLIST_MAX_SEGMENTS)
+		media_playlist = self.__media_playlists[m3u8_url]
+		media_playlist.update(r.text)
+		return media_playlist, r
+
+	def refresh_media_playlist(self, m3u8_url):
+		fn_name = 'refresh_media_playlist'
+
+		# Fetches the playlist again, and returns it with the new segments.
+		#
+		# NOTE: The add-on doesn't use this, as every plugin invocation is a
+		# new process that fetches each playlist once.  It's meant for
+		# callers that keep this object around and follow a live playlist
+		# (e.g. the HLS proxy), and they decide how often to refresh, which
+		# should be about once per target duration.
+		media_playlist, _ = self.__fetch_media_playlist(fn_name, m3u8_url)
+		return media_playlist
+
+	def __parse_clock_time(self, fn_name, value, game=None):
+		try:
+			hour, minute = [int(part) for part in value.split(':', 1)]
+			if hour < 0 or hour > 23 or minute < 0 or minute > 59:
+				raise ValueError
+		except ValueError:
+			raise self.LogicError(fn_name, 'Invalid time "%s".' % value)
+
+		# The time is local to the day the game started on, but games that
+		# run past midnight need to roll over to the next day.
+		if game is not None and game.start_time is not None:
+			reference = game.start_time.astimezone(tz.tzlocal())
+		else:
+			reference = datetime.now(tz.tzlocal())
+		when = reference.replace(hour=hour, minute=minute, second=0, microsecond=0)
+		if when < reference - timedelta(hours=12):
+			when += timedelta(days=1)
+		return when
+
+	def get_stream_position(self, m3u8_url, when, game=None):
+		fn_name = 'get_stream_position'
+
+		# 'when' is either a datetime, or a local "HH:MM" time.
+		if isinstance(when, basestring):
+			when = self.__parse_clock_time(fn_name, when, game)
+		media_playlist, _ = self.__fetch_media_playlist(fn_name, m3u8_url)
+		return media_playlist.segment_at(when)
 
 	def rewind_stream(self, stream_url, start_time):
 		if self.__hls_server is None:
@@ -645,14 +962,11 @@ class nhlgc(object):
 	def get_authorized_stream_url(self, game, m3u8_url, from_start=False):
 		fn_name = 'get_authorized_stream_url'
 
+		media_playlist, r = self.__fetch_media_playlist(fn_name, m3u8_url)
 		try:
-			r = requests.get(m3u8_url)
-			if r.status_code != 200:
-				raise self.NetworkError(fn_name, self.NETWORK_ERR_NON_200, r.status_code)
-			m3u8_obj = m3u8.loads(r.text)
 			protocol_headers = {}
-			if m3u8_obj.key is not None:
-				r = requests.get(m3u8_obj.key.uri, cookies=r.cookies)
+			if media_playlist.key is not None:
+				r = self.__direct_get(media_playlist.key.uri, cookies=r.cookies)
 				if r.status_code != 200:
 					raise self.NetworkError(fn_name, self.NETWORK_ERR_NON_200, r.status_code)
 				protocol_headers = {
@@ -662,10 +976,16 @@ class nhlgc(object):
 				for cookie in r.cookies:
 					protocol_headers['Cookie'] += '%s=%s; ' % (cookie.name, cookie.value)
 				protocol_headers['Cookie'] += 'nlqptid=' + m3u8_url.split('?', 1)[1]
-			if from_start and game['start_time'] is not None and self.__hls_server is not None:
+			if from_start and game.start_time is not None and self.__hls_server is not None:
+				# Start on the boundary of the segment that contains the start
+				# of the game.
+				start_at = game.start_time
+				segment, offset = media_playlist.segment_at(start_at)
+				if segment is not None:
+					start_at -= timedelta(seconds=offset)
 				m3u8_url = self.__hls_server + \
 					'/playlist?url=' + urllib.quote_plus(m3u8_url) + \
-					'&start_at=' + game['start_time'].strftime('%Y%m%d%H%M%S')
+					'&start_at=' + start_at.strftime('%Y%m%d%H%M%S')
 				if len(protocol_headers) > 0:
 					m3u8_url += '&headers=' + urllib.quote(urllib.urlencode(protocol_headers))
 			elif len(protocol_headers) > 0:
@@ -675,50 +995,127 @@ class nhlgc(object):
 
 		return m3u8_url
 
-	def get_archived_seasons(self, retry=True):
+	def get_archived_seasons(self):
+		cache_key = self.__http_cache.key('ARCHIVE', 'seasons')
+		entry = self.__http_cache.load(cache_key, max_age=self.ARCHIVE_CURRENT_SEASON_MAX_AGE)
+		if entry is not None:
+			return entry['body']
+		archives = self.__get_archived_seasons()
+		self.__http_cache.store(cache_key, archives)
+		return archives
+
+	def get_archived_month(self, season, month):
+		season = int(season)
+		if season < self.MIN_ARCHIVED_SEASON:
+			return []
+
+		# NOTE: The layout of the records is part of the key, so that months
+		# cached by an older version are fetched again.
+		cache_key = self.__http_cache.key('ARCHIVE', 'month', {'season': season, 'month': month, 'version': Game.SERIAL_VERSION})
+		max_age = None
+		if season >= current_season():
+			max_age = self.ARCHIVE_CURRENT_SEASON_MAX_AGE
+		entry = self.__http_cache.load(cache_key, max_age=max_age)
+		games = None
+		if entry is not None:
+			try:
+				games = [Game.unserialize(game) for game in entry['body']]
+			except (TypeError, ValueError):
+				# The entry is damaged, so fetch the month again.
+				games = None
+		if games is None:
+			games = self.__get_archived_month(season, month)
+			self.__http_cache.store(cache_key, [game.serialize() for game in games])
+
+		if self.__probe_archived_streams:
+			games = self.__probe_archived_month(season, month, games)
+		return games
+
+	def __make_stream_probe(self):
+		# Each worker gets its own session, as sessions aren't thread safe.
+		session = requests.Session()
+		session.headers = dict(self.__session.headers)
+		session.proxies = self.__session.proxies
+
+		def probe(url):
+			try:
+				r = session.head(url, allow_redirects=True, timeout=self.ARCHIVE_PROBE_TIMEOUT)
+				if r.status_code == 405 or r.status_code == 501:
+					# Not every server supports HEAD, so ask for a single
+					# byte instead.
+					r = session.get(url, headers={'Range': 'bytes=0-0'}, stream=True, timeout=self.ARCHIVE_PROBE_TIMEOUT)
+					r.close()
+				if r.status_code < 400:
+					return True
+				if r.status_code in self.ARCHIVE_PROBE_MISSING_STATUS:
+					return False
+				return None
+			except requests.exceptions.RequestException:
+				return None
+		return probe
+
+	def __probe_archived_month(self, season, month, games):
+		# The derived URLs (especially the French and away ones) are guesses,
+		# so check them all at once and hide the ones that don't exist.
+		perspectives = (self.STREAM_PERSPECTIVE_HOME, self.STREAM_PERSPECTIVE_AWAY, self.STREAM_PERSPECTIVE_FRENCH)
+		cache_key = self.__http_cache.key('ARCHIVE', 'probe', {'season': season, 'month': month})
+		entry = self.__http_cache.load(cache_key, max_age=self.ARCHIVE_PROBE_MAX_AGE)
+		available = dict(entry['body']) if entry is not None else {}
+
+		unprobed = set()
+		for game in games:
+			for perspective in perspectives:
+				for url in game.streams.get_all(perspective):
+					if url not in available:
+						unprobed.add(url)
+		if len(unprobed) > 0:
+			results = probe_urls(self.__make_stream_probe, unprobed, self.ARCHIVE_PROBE_WORKERS)
+			probed = dict((url, result) for url, result in results.items() if result is not None)
+			if len(probed) > 0:
+				available.update(probed)
+				self.__http_cache.store(cache_key, available)
+
+		probed_games = []
+		for game in games:
+			has_streams = False
+			for perspective in perspectives:
+				streams = game.streams.get_all(perspective)
+				streams[:] = [url for url in streams if available.get(url, True)]
+				has_streams = has_streams or len(streams) > 0
+			if has_streams:
+				probed_games.append(game)
+		return probed_games
+
+	def __get_archived_seasons(self, retry=True):
 		fn_name = 'get_archived_seasons'
 
 		params = {
 			'date': 'true',
 			'isFlex': 'true',
 		}
-		try:
-			r = self.__session.post(self.__urls['archived-seasons'], data=params)
-		except requests.exceptions.ConnectionError as error:
-			raise self.NetworkError(fn_name, error)
+		status_code, body = self.__conditional_request(fn_name, self.__session, 'POST', self.__urls['archived-seasons'], data=params)
 
 		# Error handling.
-		if r.status_code != 200:
-			if r.status_code == 401 and retry == True:
+		if status_code != 200:
+			if status_code == 401 and retry == True:
 				self.__retry_login()
-				return self.get_archived_seasons(retry=False)
-			raise self.NetworkError(fn_name, self.NETWORK_ERR_NON_200, r.status_code)
-		r_xml = xmltodict.parse(r.text.strip())
-		if 'code' in r_xml['result'] and r_xml['result']['code'] == 'noaccess':
+				return self.__get_archived_seasons(retry=False)
+			raise self.NetworkError(fn_name, self.NETWORK_ERR_NON_200, status_code)
+		try:
+			archives = parse_archived_seasons(body, self.MIN_ARCHIVED_SEASON)
+		except AccessDeniedError:
 			if retry == True:
 				self.__retry_login()
-				return self.get_archived_seasons(retry=False)
+				return self.__get_archived_seasons(retry=False)
 			raise self.LogicError(fn_name, 'Access denied.')
-
-		archives = []
-		try:
-			for archive_season in r_xml['result']['season']:
-				if int(archive_season['@id']) < self.MIN_ARCHIVED_SEASON or not 'g' in archive_season:
-					continue
-				season = {}
-				season['season'] = archive_season['@id']
-				season['months'] = []
-				for date in archive_season['g']:
-					month = date.split('/', 1)[0]
-					if month not in season['months']:
-						season['months'].append(month)
-				archives.append(season)
-		except KeyError:
+		except SyntaxError:
+			raise self.LogicError(fn_name, 'No archived games found.')
+		if archives is None:
 			raise self.LogicError(fn_name, 'No archived games found.')
 
 		return sorted(archives, key=lambda seasons: seasons['season'], reverse=True)
 
-	def get_archived_month(self, season, month, retry=True):
+	def __get_archived_month(self, season, month, retry=True):
 		fn_name = 'get_archived_month'
 
 		##
@@ -732,93 +1129,65 @@ class nhlgc(object):
 		# - IIII = zero padded game ID
 		##
 
-		season = int(season)
-		if season < self.MIN_ARCHIVED_SEASON:
-			return []
-
 		params = {
 			'season': str(season),
 			'month': month,
 			'isFlex': 'true',
 		}
-		try:
-			r = self.__session.post(self.__urls['archives'], data=params)
-		except requests.exceptions.ConnectionError as error:
-			raise self.NetworkError(fn_name, error)
+		status_code, body = self.__conditional_request(fn_name, self.__session, 'POST', self.__urls['archives'], data=params)
 
 		# Error handling.
-		if r.status_code != 200:
-			if r.status_code == 401 and retry == True:
+		if status_code != 200:
+			if status_code == 401 and retry == True:
 				self.__retry_login()
-				return self.get_archived_month(season, month, retry=False)
-			raise self.NetworkError(fn_name, self.NETWORK_ERR_NON_200, r.status_code)
-		r_xml = xmltodict.parse(r.text.strip())
-		if 'code' in r_xml['result'] and r_xml['result']['code'] == 'noaccess':
+				return self.__get_archived_month(season, month, retry=False)
+			raise self.NetworkError(fn_name, self.NETWORK_ERR_NON_200, status_code)
+
+		# Every game in the month shares a season, and so a CDN layout.
+		url_rule = archive_url_rule(season)
+		if url_rule is None:
+			return []
+
+		games = []
+		try:
+			for game in iter_archived_games(body):
+				if game['publishPoint'] is None:
+					continue
+				end_time = parse_utc(game['date'])
+				info = Game(
+					season      = game['season'],
+					season_type = game['type'],
+					id          = game['id'].zfill(4),
+					blocked     = game['blocked'],
+					live        = game['isLive'],
+					date        = end_time.date().isoformat(),
+					end_time    = end_time,
+					home_team   = game['homeTeam'],
+					away_team   = game['awayTeam'],
+					home_goals  = game['homeGoals'],
+					away_goals  = game['awayGoals'],
+				)
+
+				# Flag as a French game.
+				if info.home_team in self.FRENCH_STREAM_TEAMS or info.away_team in self.FRENCH_STREAM_TEAMS:
+					info.french_game = True
+
+				# Set the streams.
+				home_url, away_url, french_url = url_rule.derive(game['publishPoint'])
+				info.streams.add(self.STREAM_PERSPECTIVE_HOME, home_url)
+				info.streams.add(self.STREAM_PERSPECTIVE_AWAY, away_url)
+				if info.french_game == True:
+					info.streams.add(self.STREAM_PERSPECTIVE_FRENCH, french_url)
+
+				games.append(info)
+		except AccessDeniedError:
 			if retry == True:
 				self.__retry_login()
-				return self.get_archived_month(season, month, retry=False)
+				return self.__get_archived_month(season, month, retry=False)
 			raise self.LogicError(fn_name, 'Access denied.')
-
-		try:
-			games_list = r_xml['result']['games']['game']
-			if not isinstance(games_list, list):
-				games_list = [games_list]
-		except KeyError:
+		except SyntaxError:
 			raise self.LogicError(fn_name, 'No games found.')
 
-		games = []
-		for game in games_list:
-			if 'program' not in game or 'publishPoint' not in game['program']:
-				continue
-			info = {
-				'season':      game['season'],
-				'season_type': game['type'],
-				'id':          game['id'].zfill(4),
-				'blocked':     'blocked' in game,
-				'live':        'isLive' in game,
-				'date':        parser.parse(game['date']).replace(tzinfo=tz.tzutc()),
-				'start_time':  None,
-				'end_time':    parser.parse(game['date']).replace(tzinfo=tz.tzutc()),
-				'home_team':   game['homeTeam'],
-				'away_team':   game['awayTeam'],
-				'home_goals':  game['homeGoals'],
-				'away_goals':  game['awayGoals'],
-				'french_game': False,
-				'streams':     {
-					'home':   None,
-					'away':   None,
-					'french': None,
-				},
-			}
-
-			# Flag as a French game.
-			if info['home_team'] in self.FRENCH_STREAM_TEAMS or info['away_team'] in self.FRENCH_STREAM_TEAMS:
-				info['french_game'] = True
-
-			# Set the streams.
-			orig_url, qs = game['program']['publishPoint'].split('?', 1)
-			if season >= 2012:
-				host = 'http://nlds150.cdnak.neulion.com/'
-				base_url = orig_url[orig_url.find('/nlds_vod/') + 1:]
-				url = host + base_url + '.m3u8'
-				french_url = url.replace('/nlds_vod/nhl/', '/nlds_vod/nhlfr/')
-				french_url = french_url.replace('_h_', '_fr_')
-				french_url = french_url.replace('_whole_2', '_whole_1')
-			elif season >= 2010:
-				if season == 2011:
-					host = 'http://nhl.cdn.neulion.net/'
-				else:
-					host = 'http://nhl.cdnllnwnl.neulion.net/'
-				base_url = orig_url[orig_url.find('u/nhlmobile/'):]
-				base_url = base_url.replace('/pc/', '/ced/')
-				base_url = base_url.replace('.mp4', '')
-				url = host + base_url + '/v1/playlist.m3u8'
-				french_url = url.replace('/vod/nhl/', '/vod/nhlfr/')
-				french_url = french_url.replace('_h_', '_fr_')
-			info['streams']['home'] = url + '?' + qs
-			info['streams']['away'] = url.replace('_h_', '_a_') + '?' + qs
-			if info['french_game'] == True:
-				info['streams']['french'] = french_url + '?' + qs
-
-			games.append(info)
+		if len(games) == 0:
+			raise self.LogicError(fn_name, 'No games found.')
 		return games
@@ -0,0 +1,151 @@
+from datetime import date, datetime, timedelta
+from dateutil.relativedelta import relativedelta, SU, TU
+from dateutil.rrule import rrule, rruleset, DAILY, YEARLY
+
+# Season types, as used for gameType by the schedule API.
+PRESEASON  = 'PR'
+REGSEASON  = 'R'
+POSTSEASON = 'P'
+
+SEASON_TYPES = (PRESEASON, REGSEASON, POSTSEASON)
+
+# NOTE: These are estimates that are meant to contain every game of each
+# part of the season, not the actual schedule.  The schedule response has
+# the real game type of each game.
+#
+# - Preseason games start in the middle of September.
+# - The regular season starts in the first week of October, so the first
+#   Tuesday is used, and ends by the second Sunday of April.
+# - The playoffs run until the end of June at the latest.
+PRESEASON_START  = relativedelta(month=9, day=15)
+REGSEASON_START  = relativedelta(month=10, day=1, weekday=TU(+1))
+REGSEASON_END    = relativedelta(years=+1, month=4, day=1, weekday=SU(+2))
+POSTSEASON_END   = relativedelta(years=+1, month=6, day=30)
+
+# Seasons that didn't follow the usual calendar, as the start and end of
+# each part of the season.  A missing part wasn't played.
+IRREGULAR_SEASONS = {
+	# The lockout shortened season.
+	2012: {
+		REGSEASON:  (date(2013, 1, 19), date(2013, 4, 28)),
+		POSTSEASON: (date(2013, 4, 29), date(2013, 6, 30)),
+	},
+	# Paused in March, with the playoffs played in the summer.
+	2019: {
+		PRESEASON:  (date(2019, 9, 15), date(2019, 9, 30)),
+		REGSEASON:  (date(2019, 10, 1), date(2020, 3, 11)),
+		POSTSEASON: (date(2020, 8, 1), date(2020, 9, 28)),
+	},
+	# Started in January, without any preseason.  The first playoff games
+	# were played before the last regular season games.
+	2020: {
+		REGSEASON:  (date(2021, 1, 13), date(2021, 5, 19)),
+		POSTSEASON: (date(2021, 5, 15), date(2021, 7, 7)),
+	},
+}
+
+# The league doesn't schedule any games during the holiday break.
+HOLIDAY_BREAK = (12, (24, 25, 26))
+
+def season_for(day):
+	# Seasons are named after the year they start in, and start in the
+	# fall, unless they ran late.
+	for season, windows in IRREGULAR_SEASONS.items():
+		for first, last in windows.values():
+			if first <= day <= last:
+				return season
+	if day.month >= 9:
+		return day.year
+	return day.year - 1
+
+def current_season():
+	return season_for(date.today())
+
+class SeasonCalendar(object):
+	def __init__(self, season):
+		self.season = int(season)
+		self.__windows = None
+
+	def windows(self):
+		# Returns a dict of season type to the first and last day that its
+		# games can be played on.
+		if self.__windows is None:
+			if self.season in IRREGULAR_SEASONS:
+				self.__windows = dict(IRREGULAR_SEASONS[self.season])
+			else:
+				anchor = date(self.season, 1, 1)
+				regseason_start = anchor + REGSEASON_START
+				regseason_end   = anchor + REGSEASON_END
+				self.__windows = {
+					PRESEASON:  (anchor + PRESEASON_START, regseason_start - timedelta(days=1)),
+					REGSEASON:  (regseason_start, regseason_end),
+					POSTSEASON: (regseason_end + timedelta(days=1), anchor + POSTSEASON_END),
+				}
+		return self.__windows
+
+	def window(self, season_type=None):
+		# Returns the first and last day of the season type, or of the whole
+		# season, or None if it wasn't played.
+		windows = self.windows()
+		if season_type is not None:
+			return windows.get(season_type)
+		if not windows:
+			return None
+		return (min(start for start, _ in windows.values()), max(end for _, end in windows.values()))
+
+	def season_type_on(self, day):
+		for season_type in SEASON_TYPES:
+			window = self.windows().get(season_type)
+			if window is not None and window[0] <= day <= window[1]:
+				return season_type
+		return None
+
+	def game_days(self, season_types=None, start=None, end=None):
+		# Returns the sorted days that games can be played on, optionally
+		# limited to some season types and to a range of days.
+		if season_types is None:
+			season_types = SEASON_TYPES
+		days = rruleset()
+		for season_type in season_types:
+			window = self.window(season_type)
+			if window is None:
+				continue
+			first, last = window
+			if start is not None:
+				first = max(first, start)
+			if end is not None:
+				last = min(last, end)
+			if first > last:
+				continue
+			days.rrule(rrule(DAILY, dtstart=_midnight(first), until=_midnight(last)))
+		month, month_days = HOLIDAY_BREAK
+		days.exrule(rrule(YEARLY, dtstart=_midnight(date(self.season, 1, 1)), until=_midnight(date(self.season, 12, 31)), bymonth=month, bymonthday=month_days))
+		return [day.date() for day in days]
+
+def split_range(start, end, max_days):
+	# Splits the days from start to end, inclusive, into (first, last)
+	# ranges of at most max_days each.  Unlike game_days(), no days are left
+	# out, as the calendar is only an estimate.
+	ranges = []
+	first = start
+	while first <= end:
+		last = min(first + timedelta(days=max_days - 1), end)
+		ranges.append((first, last))
+		first = last + timedelta(days=1)
+	return ranges
+
+def request_ranges(days, max_days):
+	# Groups sorted days into as few (first, last) ranges as possible, where
+	# each range is at most max_days long, and doesn't span any gaps.
+	ranges = []
+	for day in days:
+		if ranges:
+			first, last = ranges[-1]
+			if day - last == timedelta(days=1) and (day - first).days < max_days:
+				ranges[-1] = (first, day)
+				continue
+		ranges.append((day, day))
+	return ranges
+
+def _midnight(day):
+	return datetime(day.year, day.month, day.day)
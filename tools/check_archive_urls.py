@@ -0,0 +1,53 @@
+from resources.lib.archives import archive_url_rule
+
+# Publish points of archived games and the home, away, and French stream
+# URLs that they map to, for each CDN layout.  When a layout changes, add
+# a sample of it here, and check the table with:
+#
+#     PYTHONPATH=. python tools/check_archive_urls.py
+ARCHIVE_URL_SAMPLES = (
+	(2014,
+		'adaptive://nlds150.cdnak.neulion.com/nlds_vod/nhl/vod/2014/10/08/2/2_2_mtl_tor_1415_h_whole_2?eid=3008&pf=1',
+		(
+			'http://nlds150.cdnak.neulion.com/nlds_vod/nhl/vod/2014/10/08/2/2_2_mtl_tor_1415_h_whole_2.m3u8?eid=3008&pf=1',
+			'http://nlds150.cdnak.neulion.com/nlds_vod/nhl/vod/2014/10/08/2/2_2_mtl_tor_1415_a_whole_2.m3u8?eid=3008&pf=1',
+			'http://nlds150.cdnak.neulion.com/nlds_vod/nhlfr/vod/2014/10/08/2/2_2_mtl_tor_1415_fr_whole_1.m3u8?eid=3008&pf=1',
+		)),
+	(2012,
+		'adaptive://nlds150.cdnak.neulion.com/nlds_vod/nhl/vod/2013/01/19/1/2_1_pit_phi_1213_h_whole_2?eid=1234',
+		(
+			'http://nlds150.cdnak.neulion.com/nlds_vod/nhl/vod/2013/01/19/1/2_1_pit_phi_1213_h_whole_2.m3u8?eid=1234',
+			'http://nlds150.cdnak.neulion.com/nlds_vod/nhl/vod/2013/01/19/1/2_1_pit_phi_1213_a_whole_2.m3u8?eid=1234',
+			'http://nlds150.cdnak.neulion.com/nlds_vod/nhlfr/vod/2013/01/19/1/2_1_pit_phi_1213_fr_whole_1.m3u8?eid=1234',
+		)),
+	(2011,
+		'rtmp://nhl.cdn.neulion.net/u/nhlmobile/vod/nhl/pc/2011/10/06/2_1_phi_bos_1112_h_whole_1.mp4?eid=5678',
+		(
+			'http://nhl.cdn.neulion.net/u/nhlmobile/vod/nhl/ced/2011/10/06/2_1_phi_bos_1112_h_whole_1/v1/playlist.m3u8?eid=5678',
+			'http://nhl.cdn.neulion.net/u/nhlmobile/vod/nhl/ced/2011/10/06/2_1_phi_bos_1112_a_whole_1/v1/playlist.m3u8?eid=5678',
+			'http://nhl.cdn.neulion.net/u/nhlmobile/vod/nhlfr/ced/2011/10/06/2_1_phi_bos_1112_fr_whole_1/v1/playlist.m3u8?eid=5678',
+		)),
+	(2010,
+		'rtmp://nhl.cdnllnwnl.neulion.net/u/nhlmobile/vod/nhl/pc/2010/10/07/2_1_mtl_tor_1011_h_whole_1.mp4?eid=9012',
+		(
+			'http://nhl.cdnllnwnl.neulion.net/u/nhlmobile/vod/nhl/ced/2010/10/07/2_1_mtl_tor_1011_h_whole_1/v1/playlist.m3u8?eid=9012',
+			'http://nhl.cdnllnwnl.neulion.net/u/nhlmobile/vod/nhl/ced/2010/10/07/2_1_mtl_tor_1011_a_whole_1/v1/playlist.m3u8?eid=9012',
+			'http://nhl.cdnllnwnl.neulion.net/u/nhlmobile/vod/nhlfr/ced/2010/10/07/2_1_mtl_tor_1011_fr_whole_1/v1/playlist.m3u8?eid=9012',
+		)),
+)
+
+def check():
+	ok = True
+	for season, publish_point, expected in ARCHIVE_URL_SAMPLES:
+		rule = archive_url_rule(season)
+		actual = rule.derive(publish_point) if rule is not None else None
+		if actual != expected:
+			print '%d %s: expected %r, got %r' % (season, publish_point, expected, actual)
+			ok = False
+	return ok
+
+if __name__ == '__main__':
+	import sys
+	if not check():
+		sys.exit(1)
+	print 'ok'
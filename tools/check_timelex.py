@@ -0,0 +1,58 @@
+# Checks that dateutil's _timelex.split() tokenizes strings the same way as
+# reading them through get_token() does.  Run it from the top of the tree
+# with:
+#
+#     PYTHONPATH=. python tools/check_timelex.py
+import random
+import sys
+
+from dateutil.parser import _timelex
+
+CORPUS = [
+	# Formats that the APIs use.
+	'2015-10-07T23:00:00Z',
+	'2015-10-07T23:00:00.000Z',
+	'2015-10-07',
+	'10/07/2015',
+	'Wed, 07 Oct 2015 23:00:00 GMT',
+	'Wed Oct  7 23:00:00 2015',
+	'Thu Sep 25 10:36:28 BRST 2003',
+	'1996.07.10 AD at 15:08:56 PDT',
+	'Tuesday, April 12, 1952 AD 3:30:42pm PST',
+	'3rd of May 2001',
+	'5:50 A.M. on June 13, 1990',
+	'10 h 36.5',
+	# Dots, and the letters that follow them.
+	'', '.', '..', '1.', '1..', '.1', '1.2', '1.2.3', '3.4.5x',
+	'1.a', '1.ab', '1.ab ', '1a', 'a.1', 'a.', 'a..b', 'J.R.R.',
+	'a.b.c', '12.34am', '0.5h', '4.a.', 'x.5.y',
+	# Other characters.
+	'a\x00b', '\x00', ' \t\r\n', 'a-b', '+0100', '(UTC)',
+	'\xe9t\xe9 2003', 'caf\xe9.1',
+	u'2015-10-07T23:00:00Z', u'June 13, 1990',
+]
+
+ALPHABET = 'aZ\xe9_09.. \t-:/\x00+'
+
+def check(s):
+	expected = list(_timelex(s))
+	actual = _timelex.split(s)
+	if actual != expected:
+		print '%r: expected %r, got %r' % (s, expected, actual)
+		return False
+	return True
+
+def main(count=100000, seed=0):
+	ok = True
+	for s in CORPUS:
+		ok = check(s) and ok
+	rnd = random.Random(seed)
+	for i in xrange(count):
+		s = ''.join([rnd.choice(ALPHABET) for j in xrange(rnd.randint(0, 12))])
+		ok = check(s) and ok
+	return ok
+
+if __name__ == '__main__':
+	if not main():
+		sys.exit(1)
+	print 'ok'